@@ -1,20 +1,30 @@
 from __future__ import annotations
 
+import os
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import click
-from rich.console import Console
-from rich.panel import Panel
 
 from . import __version__
-from .config import settings
-from .loop_executor import LoopExecutor
-from .models import ClaudeClient, ModelContext
-from .models.loop_state import LoopState
-from .repo import detect_project_info, detect_test_command, prepare_repo
-from .sandbox.local import LocalSandbox
 
-console = Console()
+if TYPE_CHECKING:
+    from rich.console import Console
+
+
+def response_cache_dir() -> Path:
+    """Where `--cache` persists model responses: the user cache dir, never the cwd."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "kevin" / "responses"
+
+
+@lru_cache(maxsize=1)
+def get_console() -> Console:
+    """Shared Rich console, created on first use so `--help` never imports Rich."""
+    from rich.console import Console
+
+    return Console()
 
 
 @click.group(context_settings={"help_option_names": ["-h", "--help"]})
@@ -55,6 +65,12 @@ def cli() -> None:
 @click.option(
     "--dry-run", is_flag=True, help="Run the loop without applying patches (for testing)."
 )
+@click.option(
+    "--cache",
+    "use_cache",
+    is_flag=True,
+    help="Persist model responses and replay them for identical prompts in later runs.",
+)
 def run(
     repo_input: str,
     task: str,
@@ -64,8 +80,20 @@ def run(
     model: str,
     api_key: str,
     dry_run: bool,
+    use_cache: bool,
 ) -> None:
     """Scaffold 'run' that prepares a workspace and executes a sandbox smoke test."""
+    # Heavy imports (anthropic, pydantic, rich) are deferred so `kevin --help` stays fast
+    from rich.panel import Panel
+
+    from .config import get_settings
+    from .loop_executor import LoopExecutor
+    from .models import ClaudeClient, ModelContext, ResponseCache
+    from .models.loop_state import LoopState
+    from .repo import detect_project_info, detect_test_command, prepare_repo
+    from .sandbox.local import LocalSandbox
+
+    console = get_console()
     console.rule("[bold]kevin")
     console.print(Panel.fit(task, title="Task"))
 
@@ -93,14 +121,18 @@ def run(
     # Initialize model client
     if model == "claude":
         # Use CLI arg, then env var, then settings
-        effective_api_key = api_key or settings.anthropic_api_key
+        effective_api_key = api_key or get_settings().anthropic_api_key
         if not effective_api_key:
             console.print(
                 "[red]Error:[/red] No Anthropic API key provided. "
                 "Set --api-key or ANTHROPIC_API_KEY env var."
             )
             raise click.ClickException("Missing API key")
-        client = ClaudeClient(api_key=effective_api_key)
+        cache = None
+        if use_cache:
+            cache = ResponseCache(response_cache_dir())
+            console.print(f"[bold]Response cache:[/bold] {cache.cache_dir}")
+        client = ClaudeClient(api_key=effective_api_key, cache=cache, stream=True)
     else:
         raise ValueError(f"Unsupported model: {model}")
 
@@ -127,6 +159,8 @@ def run(
     )
 
     final_state = executor.execute_loop()
+    if cache is not None and cache.hits:
+        console.print(f"[yellow]Replayed {cache.hits} cached model response(s)[/yellow]")
 
     # Print final status
     if final_state.is_completed:
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings
 
 
@@ -14,5 +16,14 @@ class Settings(BaseSettings):
         case_sensitive = False
 
 
-# Global settings instance
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Global settings instance, loaded on first use rather than at import time."""
+    return Settings()
+
+
+def __getattr__(name: str):
+    # Keep `from kevin.config import settings` working without eager loading
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager, nullcontext
+from typing import ClassVar
 
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn
@@ -10,10 +13,43 @@ from .models.loop_state import LoopState, StepResult, StepStatus, StepType
 from .models.types import ModelContext
 from .sandbox.local import LocalSandbox
 
+# Concurrency for the fetch step's file reads; plan commands run one at a time, in order
+_FETCH_READ_WORKERS = 8
+
+# (color, icon) used when printing each step result
+_STATUS_STYLE = {
+    StepStatus.COMPLETED: ("green", "✓"),
+    StepStatus.FAILED: ("red", "✗"),
+    StepStatus.SKIPPED: ("yellow", "⊘"),
+    StepStatus.PENDING: ("blue", "○"),
+    StepStatus.IN_PROGRESS: ("blue", "⟳"),
+}
+_UNKNOWN_STATUS_STYLE = ("white", "?")
+
+
+def _first_lines(text: str, count: int) -> str:
+    """Return the first `count` lines of text without splitting the whole string."""
+    end = -1
+    for _ in range(count):
+        end = text.find("\n", end + 1)
+        if end < 0:
+            return text
+    return text[:end]
+
 
 class LoopExecutor:
     """Executes the agent workflow loop with state management."""
 
+    # Step type -> name of the method that executes it
+    _STEP_HANDLERS: ClassVar[dict[StepType, str]] = {
+        StepType.PLAN: "_execute_plan_step",
+        StepType.FETCH_FILES: "_execute_fetch_files_step",
+        StepType.PROPOSE_PATCH: "_execute_propose_patch_step",
+        StepType.APPLY: "_execute_apply_step",
+        StepType.RUN_TESTS: "_execute_run_tests_step",
+        StepType.REFLECT: "_execute_reflect_step",
+    }
+
     def __init__(
         self,
         client: ClaudeClient,
@@ -27,28 +63,43 @@ class LoopExecutor:
         self.context = context
         self.loop_state = loop_state
         self.console = console or Console()
+        # Markup lines waiting to be rendered in one console.print at the next step boundary
+        self._pending: list[str] = []
 
     def execute_loop(self) -> LoopState:
         """Execute the complete agent workflow loop."""
         self.console.rule("[bold]Starting Agent Loop")
-        self.console.print(f"[bold]Max steps:[/bold] {self.loop_state.max_steps}")
-        self.console.print(f"[bold]Dry run:[/bold] {self.loop_state.dry_run}")
+        self._emit(
+            f"[bold]Max steps:[/bold] {self.loop_state.max_steps}",
+            f"[bold]Dry run:[/bold] {self.loop_state.dry_run}",
+        )
 
         while self.loop_state.can_continue():
             try:
                 self._execute_single_iteration()
             except Exception as e:
-                self.console.print(f"[red]Fatal error in iteration:[/red] {e}")
+                self._emit(f"[red]Fatal error in iteration:[/red] {e}")
                 self.loop_state.mark_failed(str(e))
                 break
 
+        self._flush()
         self._print_final_summary()
         return self.loop_state
 
+    def _emit(self, *lines: str) -> None:
+        """Queue markup lines for the next flush."""
+        self._pending.extend(lines)
+
+    def _flush(self) -> None:
+        """Render all queued lines with a single console.print."""
+        if self._pending:
+            self.console.print("\n".join(self._pending))
+            self._pending.clear()
+
     def _execute_single_iteration(self) -> None:
         """Execute a single iteration of the 6-step workflow."""
         iteration = self.loop_state.get_iteration_number()
-        self.console.print(f"\n[bold blue]=== Iteration {iteration + 1} ===[/bold blue]")
+        self._emit(f"\n[bold blue]=== Iteration {iteration + 1} ===[/bold blue]")
 
         # Execute each step in the workflow
         self._execute_step(StepType.PLAN)
@@ -77,40 +128,25 @@ class LoopExecutor:
 
     def _execute_step(self, step_type: StepType) -> None:
         """Execute a single step of the workflow."""
-        start_time = time.time()
-
-        with Progress(
-            SpinnerColumn(),
-            TextColumn(f"[bold]{step_type.value}..."),
-            console=self.console,
-            transient=True,
-        ) as progress:
-            progress.add_task("executing", total=None)
+        start_ns = time.perf_counter_ns()
 
+        # Anything queued before the step (e.g. the iteration header) shows up before the spinner
+        self._flush()
+        with self._progress(step_type):
             try:
-                if step_type == StepType.PLAN:
-                    result = self._execute_plan_step()
-                elif step_type == StepType.FETCH_FILES:
-                    result = self._execute_fetch_files_step()
-                elif step_type == StepType.PROPOSE_PATCH:
-                    result = self._execute_propose_patch_step()
-                elif step_type == StepType.APPLY:
-                    result = self._execute_apply_step()
-                elif step_type == StepType.RUN_TESTS:
-                    result = self._execute_run_tests_step()
-                elif step_type == StepType.REFLECT:
-                    result = self._execute_reflect_step()
-                else:
+                handler = self._STEP_HANDLERS.get(step_type)
+                if handler is None:
                     raise ValueError(f"Unknown step type: {step_type}")
+                result = getattr(self, handler)()
 
-                duration = time.time() - start_time
+                duration = (time.perf_counter_ns() - start_ns) / 1e9
                 result.duration_s = duration
                 self.loop_state.add_step_result(result)
 
                 self._print_step_result(result)
 
             except Exception as e:
-                duration = time.time() - start_time
+                duration = (time.perf_counter_ns() - start_ns) / 1e9
                 error_result = StepResult(
                     step_type=step_type, status=StepStatus.FAILED, error=str(e), duration_s=duration
                 )
@@ -123,6 +159,22 @@ class LoopExecutor:
                     self.loop_state.mark_failed(f"Critical step failed: {step_type.value}")
                 # Other steps can be retried in next iteration
 
+    def _progress(self, step_type: StepType) -> AbstractContextManager:
+        """Spinner shown while a step runs; skipped entirely when output isn't a terminal."""
+        if not self.console.is_terminal:
+            return nullcontext()
+
+        # Steps are seconds-long network waits, so a slow refresh is plenty
+        progress = Progress(
+            SpinnerColumn(),
+            TextColumn(f"[bold]{step_type.value}..."),
+            console=self.console,
+            transient=True,
+            refresh_per_second=4,
+        )
+        progress.add_task("executing", total=None)
+        return progress
+
     def _execute_plan_step(self) -> StepResult:
         """Execute the plan step."""
         try:
@@ -139,47 +191,34 @@ class LoopExecutor:
 
     def _execute_fetch_files_step(self) -> StepResult:
         """Execute the fetch files step."""
-        if not self.loop_state.current_plan:
+        plan = self.loop_state.current_plan
+        if not plan:
             return StepResult(
                 step_type=StepType.FETCH_FILES, status=StepStatus.FAILED, error="No plan available"
             )
 
         try:
-            plan = self.loop_state.current_plan
             fetched_files = []
             failed_files = []
 
-            for filepath in plan.files_to_read:
-                try:
-                    content = self.sandbox.read_file(filepath)
-                    self.context.file_contents[filepath] = content
-                    fetched_files.append(filepath)
-                except Exception as e:
-                    failed_files.append(f"{filepath}: {e}")
-
-            # Also run any commands from the plan
+            # File reads are independent, so they share a pool; Executor.map hands results
+            # back in plan order
+            with ThreadPoolExecutor(max_workers=_FETCH_READ_WORKERS) as read_pool:
+                reads = read_pool.map(self._read_plan_file, plan.files_to_read)
+                for filepath, (content, error) in zip(plan.files_to_read, reads):
+                    if error is None:
+                        self.context.file_contents[filepath] = content
+                        fetched_files.append(filepath)
+                    else:
+                        failed_files.append(f"{filepath}: {error}")
+
+            # Plan commands often depend on each other (install, build, test), so they run
+            # sequentially after the reads
             for cmd in plan.commands_to_run:
-                try:
-                    result = self.sandbox.exec(cmd, timeout=120)
-                    self.context.command_results.append(
-                        {
-                            "command": cmd,
-                            "returncode": result.returncode,
-                            "stdout": result.stdout,
-                            "stderr": result.stderr,
-                            "duration_s": result.duration_s,
-                        }
-                    )
-                except Exception as e:
-                    self.context.command_results.append(
-                        {
-                            "command": cmd,
-                            "returncode": -1,
-                            "stdout": "",
-                            "stderr": str(e),
-                            "duration_s": 0.0,
-                        }
-                    )
+                self.context.command_results.append(self._run_plan_command(cmd))
+
+            if fetched_files:
+                self.context.mark_file_contents_changed()
 
             output = f"Fetched {len(fetched_files)} files successfully"
             if failed_files:
@@ -192,17 +231,45 @@ class LoopExecutor:
                 step_type=StepType.FETCH_FILES, status=StepStatus.FAILED, error=str(e)
             )
 
+    def _read_plan_file(self, filepath: str) -> tuple[str | None, Exception | None]:
+        """Read one planned file, returning (content, error) instead of raising."""
+        try:
+            return self.sandbox.read_file(filepath), None
+        except Exception as e:
+            return None, e
+
+    def _run_plan_command(self, cmd: str) -> dict:
+        """Run one planned command and describe the outcome as a command result."""
+        try:
+            result = self.sandbox.exec(cmd, timeout=120)
+            return {
+                "command": cmd,
+                "returncode": result.returncode,
+                "stdout": result.stdout,
+                "stderr": result.stderr,
+                "duration_s": result.duration_s,
+            }
+        except Exception as e:
+            return {
+                "command": cmd,
+                "returncode": -1,
+                "stdout": "",
+                "stderr": str(e),
+                "duration_s": 0.0,
+            }
+
     def _execute_propose_patch_step(self) -> StepResult:
         """Execute the propose patch step."""
         try:
-            if not self.loop_state.current_plan:
+            plan = self.loop_state.current_plan
+            if not plan:
                 return StepResult(
                     step_type=StepType.PROPOSE_PATCH,
                     status=StepStatus.FAILED,
                     error="No plan available",
                 )
 
-            patch = self.client.propose_patch(self.context, self.loop_state.current_plan)
+            patch = self.client.propose_patch(self.context, plan)
             self.loop_state.current_patch = patch
 
             output = f"Patch generated ({len(patch.unified_diff)} chars)"
@@ -221,7 +288,8 @@ class LoopExecutor:
 
     def _execute_apply_step(self) -> StepResult:
         """Execute the apply patch step with enhanced error handling."""
-        if not self.loop_state.current_patch:
+        patch = self.loop_state.current_patch
+        if not patch:
             return StepResult(
                 step_type=StepType.APPLY, status=StepStatus.FAILED, error="No patch available"
             )
@@ -235,7 +303,6 @@ class LoopExecutor:
 
         try:
             # Apply the patch using the sandbox
-            patch = self.loop_state.current_patch
             result = self.sandbox.apply_patch(patch.unified_diff)
 
             if result.returncode == 0:
@@ -246,8 +313,8 @@ class LoopExecutor:
                 )
             else:
                 # Enhanced error information for reflection
-                first_20_lines = "\n".join(patch.unified_diff.split("\n")[:20])
-                stderr_tail = result.stderr[-2000:] if len(result.stderr) > 2000 else result.stderr
+                first_20_lines = _first_lines(patch.unified_diff, 20)
+                stderr_tail = result.stderr[-2000:]
 
                 error_details = {
                     "git_stderr": stderr_tail,
@@ -258,12 +325,16 @@ class LoopExecutor:
                 }
 
                 # Create detailed error message for reflection
-                detailed_error = "PATCH APPLICATION FAILED\n"
-                detailed_error += f"Git exit code: {result.returncode}\n"
-                detailed_error += f"Git stderr (last 2000 chars): {stderr_tail}\n"
-                detailed_error += f"Patch preview (first 20 lines):\n{first_20_lines}\n"
+                parts = [
+                    "PATCH APPLICATION FAILED",
+                    f"Git exit code: {result.returncode}",
+                    f"Git stderr (last 2000 chars): {stderr_tail}",
+                    f"Patch preview (first 20 lines):\n{first_20_lines}",
+                ]
                 if result.stdout:
-                    detailed_error += f"Git stdout: {result.stdout}\n"
+                    parts.append(f"Git stdout: {result.stdout}")
+                parts.append("")
+                detailed_error = "\n".join(parts)
 
                 return StepResult(
                     step_type=StepType.APPLY,
@@ -305,21 +376,14 @@ class LoopExecutor:
     def _execute_reflect_step(self) -> StepResult:
         """Execute the reflect step with enhanced patch failure handling."""
         try:
-            # Check if there was a patch application failure in this iteration
-            apply_failure = None
-            for result in reversed(self.loop_state.step_results):
-                if result.step_type == StepType.APPLY and result.status == StepStatus.FAILED:
-                    apply_failure = result
-                    break
+            # Check if there was a patch application failure
+            apply_failure = self.loop_state.get_last_apply_failure()
 
             if apply_failure:
                 # Use patch failure specific reflection
                 error_details = apply_failure.output or apply_failure.error
-                patch_preview = (
-                    self.loop_state.current_patch.unified_diff[:200]
-                    if self.loop_state.current_patch
-                    else "None"
-                )
+                current_patch = self.loop_state.current_patch
+                patch_preview = current_patch.unified_diff[:200] if current_patch else "None"
                 context_str = (
                     f"Files: {list(self.context.file_contents.keys())}\n"
                     f"Commands: {len(self.context.command_results)} executed\n"
@@ -352,10 +416,11 @@ class LoopExecutor:
             # Check if we should stop based on reflection
             if not reflection.should_retry:
                 self.loop_state.should_stop = True
+                last = self.loop_state.get_last_step_result()
                 if (
-                    self.loop_state.get_last_step_result()
-                    and self.loop_state.get_last_step_result().step_type == StepType.RUN_TESTS
-                    and self.loop_state.get_last_step_result().status == StepStatus.COMPLETED
+                    last
+                    and last.step_type == StepType.RUN_TESTS
+                    and last.status == StepStatus.COMPLETED
                 ):
                     self.loop_state.mark_completed()
 
@@ -367,60 +432,45 @@ class LoopExecutor:
 
     def _print_step_result(self, result: StepResult) -> None:
         """Print the result of a step execution."""
-        status_color = {
-            StepStatus.COMPLETED: "green",
-            StepStatus.FAILED: "red",
-            StepStatus.SKIPPED: "yellow",
-            StepStatus.PENDING: "blue",
-            StepStatus.IN_PROGRESS: "blue",
-        }.get(result.status, "white")
-
-        status_icon = {
-            StepStatus.COMPLETED: "✓",
-            StepStatus.FAILED: "✗",
-            StepStatus.SKIPPED: "⊘",
-            StepStatus.PENDING: "○",
-            StepStatus.IN_PROGRESS: "⟳",
-        }.get(result.status, "?")
+        status_color, status_icon = _STATUS_STYLE.get(result.status, _UNKNOWN_STATUS_STYLE)
 
         duration_str = f" ({result.duration_s:.1f}s)" if result.duration_s else ""
 
-        self.console.print(
+        lines = [
             f"[{status_color}]{status_icon}[/{status_color}] "
             f"[bold]{result.step_type.value}[/bold]{duration_str}"
-        )
+        ]
 
         if result.output:
-            self.console.print(f"  [dim]{result.output}[/dim]")
+            lines.append(f"  [dim]{result.output}[/dim]")
 
         if result.error:
-            self.console.print(f"  [red]Error: {result.error}[/red]")
+            lines.append(f"  [red]Error: {result.error}[/red]")
+
+        self._emit(*lines)
 
     def _print_final_summary(self) -> None:
         """Print the final summary of the loop execution."""
         self.console.rule("[bold]Loop Summary")
 
         if self.loop_state.is_completed:
-            self.console.print("[green]✓ Task completed successfully![/green]")
+            lines = ["[green]✓ Task completed successfully![/green]"]
         elif self.loop_state.is_failed:
-            self.console.print("[red]✗ Task failed[/red]")
+            lines = ["[red]✗ Task failed[/red]"]
         else:
-            self.console.print("[yellow]⊘ Task stopped (max steps reached or manual stop)[/yellow]")
+            lines = ["[yellow]⊘ Task stopped (max steps reached or manual stop)[/yellow]"]
 
-        self.console.print(
-            f"Total steps: {self.loop_state.current_step}/{self.loop_state.max_steps}"
-        )
-        self.console.print(f"Total duration: {self.loop_state.total_duration_s:.1f}s")
+        lines.append(f"Total steps: {self.loop_state.current_step}/{self.loop_state.max_steps}")
+        lines.append(f"Total duration: {self.loop_state.total_duration_s:.1f}s")
 
         # Show step summary
-        completed_steps = sum(
-            1 for r in self.loop_state.step_results if r.status == StepStatus.COMPLETED
-        )
-        failed_steps = sum(1 for r in self.loop_state.step_results if r.status == StepStatus.FAILED)
-        skipped_steps = sum(
-            1 for r in self.loop_state.step_results if r.status == StepStatus.SKIPPED
-        )
+        completed_steps = self.loop_state.get_status_count(StepStatus.COMPLETED)
+        failed_steps = self.loop_state.get_status_count(StepStatus.FAILED)
+        skipped_steps = self.loop_state.get_status_count(StepStatus.SKIPPED)
 
-        self.console.print(
+        lines.append(
             f"Steps: {completed_steps} completed, {failed_steps} failed, {skipped_steps} skipped"
         )
+
+        self._emit(*lines)
+        self._flush()
@@ -1,15 +1,53 @@
-from .claude import ClaudeClient
-from .loop_state import LoopState, StepResult, StepStatus, StepType
-from .types import ModelContext, Patch, Plan, Reflection
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .cache import ResponseCache
+    from .claude import AsyncClaudeClient, ClaudeClient
+    from .loop_state import LoopState, StepResult, StepStatus, StepType
+    from .types import ModelContext, Patch, Plan, Reflection
+
+# Public name -> submodule; resolved on first attribute access (PEP 562) so importing
+# a light submodule such as `kevin.models.loop_state` doesn't pull in the anthropic SDK.
+_LAZY_EXPORTS = {
+    "AsyncClaudeClient": ".claude",
+    "ClaudeClient": ".claude",
+    "Plan": ".types",
+    "Patch": ".types",
+    "Reflection": ".types",
+    "ModelContext": ".types",
+    "ResponseCache": ".cache",
+    "LoopState": ".loop_state",
+    "StepResult": ".loop_state",
+    "StepStatus": ".loop_state",
+    "StepType": ".loop_state",
+}
 
 __all__ = [
+    "AsyncClaudeClient",
     "ClaudeClient",
     "Plan",
     "Patch",
     "Reflection",
     "ModelContext",
+    "ResponseCache",
     "LoopState",
     "StepResult",
     "StepStatus",
     "StepType",
 ]
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
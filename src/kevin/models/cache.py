@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+
+try:  # Optional: much faster non-cryptographic hashing for large prompts
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+class ResponseCache:
+    """
+    Content-addressed cache of model responses keyed by a hash of the request.
+    Entries live in memory and, when `cache_dir` is set, are persisted as one file per key
+    so repeated prompts are also skipped across runs.
+    """
+
+    def __init__(self, cache_dir: str | Path | None = None):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self._memory: dict[str, str] = {}
+        # Responses served from the cache instead of the API, so callers can report replays
+        self.hits = 0
+
+    @staticmethod
+    def make_key(model: str, max_tokens: int, prompt: str) -> str:
+        """Hash everything that determines the response."""
+        data = f"{model}\0{max_tokens}\0{prompt}".encode()
+        if xxhash is not None:
+            return xxhash.xxh3_128_hexdigest(data)
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        response = self._memory.get(key)
+        if response is None and self.cache_dir is not None:
+            try:
+                response = (self.cache_dir / f"{key}.txt").read_text(encoding="utf-8")
+            except FileNotFoundError:
+                return None
+            self._memory[key] = response
+        if response is not None:
+            self.hits += 1
+        return response
+
+    def set(self, key: str, response: str) -> None:
+        self._memory[key] = response
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            (self.cache_dir / f"{key}.txt").write_text(response, encoding="utf-8")
+
+    def clear(self) -> None:
+        """Drop in-memory entries (persisted files are left untouched)."""
+        self._memory.clear()
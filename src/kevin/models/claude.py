@@ -1,12 +1,25 @@
 from __future__ import annotations
 
-from anthropic import Anthropic
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
 
+from anthropic import (
+    Anthropic,
+    APIConnectionError,
+    APIStatusError,
+    AsyncAnthropic,
+    InternalServerError,
+    RateLimitError,
+)
+
+from .cache import ResponseCache
 from .prompts import (
-    PATCH_PROMPT,
-    PLAN_PROMPT,
-    REFLECT_PATCH_FAILURE_PROMPT,
-    REFLECT_PROMPT,
+    PATCH_TEMPLATE,
+    PLAN_TEMPLATE,
+    REFLECT_PATCH_FAILURE_TEMPLATE,
+    REFLECT_TEMPLATE,
     FilePreviewManager,
     format_command_results,
     format_file_contents_with_expansion,
@@ -14,20 +27,41 @@ from .prompts import (
 from .types import ModelContext, Patch, Plan, Reflection
 from .validation import DiffValidator, JSONValidator
 
+DEFAULT_MODEL = "claude-3-5-sonnet-20241022"
 
-class ClaudeClient:
-    """Claude Sonnet client for AI engineering tasks."""
+# Transient API errors worth retrying with exponential backoff (1s, 2s, ...)
+_RETRYABLE_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+_MAX_ATTEMPTS = 3
+_BACKOFF_BASE_S = 1.0
 
-    def __init__(self, api_key: str | None = None, model: str = "claude-3-5-sonnet-20241022"):
-        self.client = Anthropic(api_key=api_key)
+# Message Batches are processed asynchronously server-side; poll until they end or,
+# past the deadline, cancel them and send the prompts one by one instead
+_BATCH_POLL_INTERVAL_S = 5.0
+_BATCH_TIMEOUT_S = 15 * 60.0
+# Upper bound on in-flight requests for the async client's concurrent batch
+_MAX_CONCURRENT_REQUESTS = 4
+
+
+class _ClaudeClientBase:
+    """Prompt building, response parsing and preview state shared by sync/async clients."""
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        cache: ResponseCache | None = None,
+        stream: bool = False,
+    ):
         self.model = model
+        self.cache = cache
+        self.stream = stream
         self.json_validator = JSONValidator()
         self.diff_validator = DiffValidator()
         self.preview_manager = FilePreviewManager()
+        # (context, cache key, formatted file contents) from the last patch prompt
+        self._formatted_files: tuple[ModelContext, tuple[int, ...], str] | None = None
 
-    def plan(self, context: ModelContext) -> Plan:
-        """Generate a plan for approaching the task."""
-        prompt = PLAN_PROMPT.format(
+    def _build_plan_prompt(self, context: ModelContext) -> str:
+        return PLAN_TEMPLATE.render(
             task=context.task,
             repo_path=context.repo_path,
             test_command=context.test_command or "none detected",
@@ -39,58 +73,58 @@ class ClaudeClient:
             test_files=", ".join(context.test_files) if context.test_files else "none found",
         )
 
-        response = self._call_claude(prompt, max_tokens=1000)
-        return self._parse_plan_response(response)
-
-    def propose_patch(self, context: ModelContext, plan: Plan) -> Patch:
-        """Propose a unified diff patch based on context and plan."""
-        # Use enhanced file formatting with expansion support
-        file_contents = format_file_contents_with_expansion(
-            context.file_contents, self.preview_manager, context.preview_max_lines
-        )
+    def _build_patch_prompt(self, context: ModelContext) -> str:
+        file_contents = self._format_file_contents(context)
         command_results = format_command_results(context.command_results)
 
-        prompt = PATCH_PROMPT.format(
+        return PATCH_TEMPLATE.render(
             task=context.task, file_contents=file_contents, command_results=command_results
         )
 
-        response = self._call_claude(prompt, max_tokens=context.max_tokens)
-        return self._parse_patch_response(response)
+    def _format_file_contents(self, context: ModelContext) -> str:
+        """Format file previews, reusing the last result while nothing it depends on changed."""
+        key = (
+            context.file_contents_version,
+            len(context.file_contents),
+            context.preview_max_lines,
+            self.preview_manager.version,
+        )
+        cached = self._formatted_files
+        if cached is not None and cached[0] is context and cached[1] == key:
+            return cached[2]
 
-    def reflect(self, context: ModelContext, fail_logs: str) -> Reflection:
-        """Reflect on failures and determine next steps."""
+        # Use enhanced file formatting with expansion support
+        formatted = format_file_contents_with_expansion(
+            context.file_contents, self.preview_manager, context.preview_max_lines
+        )
+        self._formatted_files = (context, key, formatted)
+        return formatted
+
+    def _build_reflect_prompt(self, context: ModelContext, fail_logs: str) -> str:
         context_str = (
             f"Files: {list(context.file_contents.keys())}\n"
             f"Commands: {len(context.command_results)} executed"
         )
+        return REFLECT_TEMPLATE.render(task=context.task, fail_logs=fail_logs, context=context_str)
 
-        prompt = REFLECT_PROMPT.format(task=context.task, fail_logs=fail_logs, context=context_str)
-
-        response = self._call_claude(prompt, max_tokens=1000)
-        return self._parse_reflection_response(response)
-
-    def reflect_on_patch_failure(
+    def _build_patch_failure_prompt(
         self, context: ModelContext, error_details: str, context_str: str
-    ) -> Reflection:
-        """Reflect specifically on patch application failures."""
-        prompt = REFLECT_PATCH_FAILURE_PROMPT.format(
+    ) -> str:
+        return REFLECT_PATCH_FAILURE_TEMPLATE.render(
             task=context.task, error_details=error_details, context=context_str
         )
 
-        response = self._call_claude(prompt, max_tokens=1000)
-        return self._parse_reflection_response(response)
+    def _cache_key(self, prompt: str, max_tokens: int) -> str | None:
+        if self.cache is None:
+            return None
+        return ResponseCache.make_key(self.model, max_tokens, prompt)
 
-    def _call_claude(self, prompt: str, max_tokens: int = 1000) -> str:
-        """Make a call to Claude API with error handling."""
-        try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=max_tokens,
-                messages=[{"role": "user", "content": prompt}],
-            )
-            return response.content[0].text
-        except Exception as e:
-            raise RuntimeError(f"Claude API call failed: {e}") from e
+    def _request_kwargs(self, prompt: str, max_tokens: int) -> dict:
+        return {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": prompt}],
+        }
 
     def _parse_plan_response(self, response: str) -> Plan:
         """Parse and validate plan response from Claude with enhanced validation and auto-repair."""
@@ -120,3 +154,228 @@ class ClaudeClient:
             file_hints = self.preview_manager.get_expansion_hints(content)
             hints.extend([f"{filepath}: {hint}" for hint in file_hints])
         return hints
+
+
+class ClaudeClient(_ClaudeClientBase):
+    """Claude Sonnet client for AI engineering tasks."""
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model: str = DEFAULT_MODEL,
+        cache: ResponseCache | None = None,
+        stream: bool = False,
+        transport: Callable[..., Any] | None = None,
+    ):
+        """
+        `transport(**request_kwargs)` replaces `messages.create` for requests and must return
+        an object with `.content[0].text` (handy as a test fake). Streaming and batch calls
+        always use the SDK client, so a transport can't be combined with stream=True.
+        """
+        if transport is not None and stream:
+            raise ValueError("transport is only used for non-streaming requests")
+        super().__init__(model, cache, stream)
+        self.client = Anthropic(api_key=api_key)
+        self.transport = transport if transport is not None else self.client.messages.create
+
+    def plan(self, context: ModelContext) -> Plan:
+        """Generate a plan for approaching the task."""
+        response = self._call_claude(self._build_plan_prompt(context), max_tokens=1000)
+        return self._parse_plan_response(response)
+
+    def propose_patch(self, context: ModelContext, plan: Plan) -> Patch:
+        """Propose a unified diff patch based on context and plan."""
+        prompt = self._build_patch_prompt(context)
+        response = self._call_claude(prompt, max_tokens=context.max_tokens)
+        return self._parse_patch_response(response)
+
+    def reflect(self, context: ModelContext, fail_logs: str) -> Reflection:
+        """Reflect on failures and determine next steps."""
+        prompt = self._build_reflect_prompt(context, fail_logs)
+        response = self._call_claude(prompt, max_tokens=1000)
+        return self._parse_reflection_response(response)
+
+    def reflect_on_patch_failure(
+        self, context: ModelContext, error_details: str, context_str: str
+    ) -> Reflection:
+        """Reflect specifically on patch application failures."""
+        prompt = self._build_patch_failure_prompt(context, error_details, context_str)
+        response = self._call_claude(prompt, max_tokens=1000)
+        return self._parse_reflection_response(response)
+
+    def _call_claude(self, prompt: str, max_tokens: int = 1000) -> str:
+        """Make a call to Claude API, serving repeated prompts from the response cache."""
+        key = self._cache_key(prompt, max_tokens)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        text = self._create_with_retry(prompt, max_tokens)
+        if key is not None:
+            self.cache.set(key, text)
+        return text
+
+    def _send(self, prompt: str, max_tokens: int) -> str:
+        kwargs = self._request_kwargs(prompt, max_tokens)
+        if not self.stream:
+            return self.transport(**kwargs).content[0].text
+
+        # Receive text as it is generated so long patches never sit on an idle connection
+        with self.client.messages.stream(**kwargs) as stream:
+            return "".join(stream.text_stream)
+
+    def _create_with_retry(self, prompt: str, max_tokens: int) -> str:
+        """Send a single request, retrying transient errors with exponential backoff."""
+        attempt = 0
+        while True:
+            try:
+                return self._send(prompt, max_tokens)
+            except _RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt >= _MAX_ATTEMPTS:
+                    raise RuntimeError(f"Claude API call failed: {e}") from e
+                time.sleep(_BACKOFF_BASE_S * 2 ** (attempt - 1))
+            except Exception as e:
+                raise RuntimeError(f"Claude API call failed: {e}") from e
+
+    def batch_call(
+        self, prompts: list[str], max_tokens: int = 1000, timeout_s: float = _BATCH_TIMEOUT_S
+    ) -> list[str]:
+        """
+        Send several independent prompts through the Message Batches API.
+
+        One batch submission replaces N request round-trips. Responses are returned
+        in the same order as `prompts`; any request that did not succeed inside the
+        batch is retried individually. Falls back to sequential calls when the
+        batch endpoint is unavailable or the batch hasn't ended after `timeout_s`.
+        """
+        if not prompts:
+            return []
+
+        requests = [
+            {"custom_id": f"prompt-{i}", "params": self._request_kwargs(prompt, max_tokens)}
+            for i, prompt in enumerate(prompts)
+        ]
+        try:
+            batch = self.client.messages.batches.create(requests=requests)
+        except APIStatusError:
+            return [self._call_claude(prompt, max_tokens=max_tokens) for prompt in prompts]
+
+        deadline = time.monotonic() + timeout_s
+        while batch.processing_status != "ended":
+            if time.monotonic() >= deadline:
+                try:
+                    self.client.messages.batches.cancel(batch.id)
+                except APIStatusError:
+                    pass  # Already ending; nothing is read from it either way
+                return [self._call_claude(prompt, max_tokens=max_tokens) for prompt in prompts]
+            time.sleep(_BATCH_POLL_INTERVAL_S)
+            batch = self.client.messages.batches.retrieve(batch.id)
+
+        responses: list[str | None] = [None] * len(prompts)
+        for entry in self.client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                index = int(entry.custom_id.removeprefix("prompt-"))
+                responses[index] = entry.result.message.content[0].text
+
+        return [
+            response if response is not None else self._call_claude(prompt, max_tokens=max_tokens)
+            for prompt, response in zip(prompts, responses)
+        ]
+
+
+class AsyncClaudeClient(_ClaudeClientBase):
+    """Asyncio variant of ClaudeClient so independent model calls can overlap."""
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model: str = DEFAULT_MODEL,
+        cache: ResponseCache | None = None,
+        stream: bool = False,
+        transport: Callable[..., Awaitable[Any]] | None = None,
+    ):
+        """
+        `transport` is the async counterpart of ClaudeClient's: awaited with the request
+        kwargs in place of `messages.create`, and not combinable with stream=True.
+        """
+        if transport is not None and stream:
+            raise ValueError("transport is only used for non-streaming requests")
+        super().__init__(model, cache, stream)
+        self.client = AsyncAnthropic(api_key=api_key)
+        self.transport = transport if transport is not None else self.client.messages.create
+
+    async def plan(self, context: ModelContext) -> Plan:
+        """Generate a plan for approaching the task."""
+        response = await self._call_claude(self._build_plan_prompt(context), max_tokens=1000)
+        return self._parse_plan_response(response)
+
+    async def propose_patch(self, context: ModelContext, plan: Plan) -> Patch:
+        """Propose a unified diff patch based on context and plan."""
+        response = await self._call_claude(
+            self._build_patch_prompt(context), max_tokens=context.max_tokens
+        )
+        return self._parse_patch_response(response)
+
+    async def reflect(self, context: ModelContext, fail_logs: str) -> Reflection:
+        """Reflect on failures and determine next steps."""
+        response = await self._call_claude(
+            self._build_reflect_prompt(context, fail_logs), max_tokens=1000
+        )
+        return self._parse_reflection_response(response)
+
+    async def reflect_on_patch_failure(
+        self, context: ModelContext, error_details: str, context_str: str
+    ) -> Reflection:
+        """Reflect specifically on patch application failures."""
+        prompt = self._build_patch_failure_prompt(context, error_details, context_str)
+        response = await self._call_claude(prompt, max_tokens=1000)
+        return self._parse_reflection_response(response)
+
+    async def _call_claude(self, prompt: str, max_tokens: int = 1000) -> str:
+        """Make a call to Claude API, serving repeated prompts from the response cache."""
+        key = self._cache_key(prompt, max_tokens)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        text = await self._create_with_retry(prompt, max_tokens)
+        if key is not None:
+            self.cache.set(key, text)
+        return text
+
+    async def _send(self, prompt: str, max_tokens: int) -> str:
+        kwargs = self._request_kwargs(prompt, max_tokens)
+        if not self.stream:
+            response = await self.transport(**kwargs)
+            return response.content[0].text
+
+        # Receive text as it is generated so long patches never sit on an idle connection
+        async with self.client.messages.stream(**kwargs) as stream:
+            return "".join([text async for text in stream.text_stream])
+
+    async def _create_with_retry(self, prompt: str, max_tokens: int) -> str:
+        """Send a single request, retrying transient errors with exponential backoff."""
+        attempt = 0
+        while True:
+            try:
+                return await self._send(prompt, max_tokens)
+            except _RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt >= _MAX_ATTEMPTS:
+                    raise RuntimeError(f"Claude API call failed: {e}") from e
+                await asyncio.sleep(_BACKOFF_BASE_S * 2 ** (attempt - 1))
+            except Exception as e:
+                raise RuntimeError(f"Claude API call failed: {e}") from e
+
+    async def batch_call(self, prompts: list[str], max_tokens: int = 1000) -> list[str]:
+        """Send several independent prompts concurrently, preserving input order."""
+        semaphore = asyncio.Semaphore(_MAX_CONCURRENT_REQUESTS)
+
+        async def call(prompt: str) -> str:
+            async with semaphore:
+                return await self._call_claude(prompt, max_tokens=max_tokens)
+
+        return list(await asyncio.gather(*(call(prompt) for prompt in prompts)))
@@ -8,6 +8,12 @@ from .prompts import FilePreviewManager
 from .types import ModelContext
 
 
+def _numbered_lines(template: str, start: int, stop: int) -> str:
+    """Render a %d line template for each number in range(start, stop) in one format call."""
+    numbers = tuple(range(start, stop))
+    return ((template + "\n") * len(numbers) % numbers)[:-1]
+
+
 def demonstrate_json_validation():
     """Demonstrate JSON validation and auto-repair capabilities."""
     print("=== JSON Validation Demo ===")
@@ -46,13 +52,11 @@ def demonstrate_prompt_shorteners():
     print("\n=== Prompt Shorteners Demo ===")
     
     # Create a large file content for demonstration
-    large_file_content = "\n".join([
-        f"# Line {i}: This is a sample line of code" for i in range(1, 201)
-    ])
+    large_file_content = _numbered_lines("# Line %d: This is a sample line of code", 1, 201)
     
     file_contents = {
         "main.py": large_file_content,
-        "utils.py": "\n".join([f"def func_{i}(): pass" for i in range(1, 51)]),
+        "utils.py": _numbered_lines("def func_%d(): pass", 1, 51),
         "config.py": "# Configuration file\nDEBUG = True\nPORT = 8000"
     }
     
@@ -127,7 +131,7 @@ def demonstrate_smart_truncation():
         "",
         "if __name__ == '__main__':",
         "    print('Hello world')",
-    ] + [f"    # Additional line {i}" for i in range(1, 50)])
+    ]) + "\n" + _numbered_lines("    # Additional line %d", 1, 50)
     
     preview_manager = FilePreviewManager()
     smart_truncation = SmartTruncation(preview_manager)
@@ -149,8 +153,8 @@ def demonstrate_integration():
         task="Add error handling to the main function",
         repo_path="/path/to/project",
         file_contents={
-            "main.py": "\n".join([f"line {i}" for i in range(1, 101)]),
-            "utils.py": "\n".join([f"def util_{i}(): pass" for i in range(1, 26)]),
+            "main.py": _numbered_lines("line %d", 1, 101),
+            "utils.py": _numbered_lines("def util_%d(): pass", 1, 26),
         },
         preview_max_lines=30,
         enable_smart_truncation=True
@@ -1,23 +1,120 @@
 from __future__ import annotations
 
 import re
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from itertools import accumulate
 from typing import Dict, List, Optional, Tuple
 
 from .prompts import FilePreviewManager
 
+# All expansion phrasings in one alternation so a request is scanned once
+_EXPANSION_RE = re.compile(
+    r"(?:show me more of|expand|show more|full content of|complete)\s+(.+)", re.IGNORECASE
+)
+
+# Imports, function and class definitions, matched across the whole file at once.
+# Whitespace classes exclude "\n" so a match never spans lines.
+_IMPORTANT_RE = re.compile(
+    r"^[^\S\n]*(?:"
+    r"(?P<imports>(?:import|from) (?=[^\S\n]*[^\s]))"
+    r"|(?P<functions>def[^\S\n]+\w)"
+    r"|(?P<classes>class[^\S\n]+\w)"
+    r")",
+    re.MULTILINE,
+)
+
+
+class _FileIndex:
+    """Lookup tables over a list of available files."""
+
+    __slots__ = (
+        "files",
+        "file_set",
+        "by_basename",
+        "basenames",
+        "lowered",
+        "haystack",
+        "starts",
+        "_trigrams",
+    )
+
+    def __init__(self, files: Tuple[str, ...]):
+        self.files = files
+        self.file_set = frozenset(files)
+        self.basenames = tuple(path.rsplit("/", 1)[-1] for path in files)
+        self.lowered = tuple(path.lower() for path in files)
+        # All lowercased paths in one NUL-separated string (NUL can't occur in a path), so a
+        # partial match is a single C-level str.find instead of one `in` test per path
+        self.haystack = "\0".join(self.lowered)
+        self.starts = list(accumulate((len(path) + 1 for path in self.lowered[:-1]), initial=0))
+        self.by_basename: Dict[str, str] = {}
+        for path, basename in zip(files, self.basenames):
+            self.by_basename.setdefault(basename, path)  # first occurrence wins
+        self._trigrams: Optional[frozenset[str]] = None
+
+    def may_contain(self, text: str) -> bool:
+        """
+        Cheap prefilter for haystack.find(text): False when some 3-gram of text occurs in no
+        path, so the substring cannot be present. Built on first use, then reused.
+        """
+        if self._trigrams is None:
+            haystack = self.haystack
+            self._trigrams = frozenset(haystack[i : i + 3] for i in range(len(haystack) - 2))
+        trigrams = self._trigrams
+        return all(text[i : i + 3] in trigrams for i in range(len(text) - 2))
+
+
+@lru_cache(maxsize=8)
+def _file_index(files: Tuple[str, ...]) -> _FileIndex:
+    """Lookup index for a file list, shared by every lookup against the same files."""
+    return _FileIndex(files)
+
+
+@lru_cache(maxsize=1024)
+def _match_file(file_reference: str, files: Tuple[str, ...]) -> Optional[str]:
+    """Find the best matching file for a given reference (repeat lookups are cache hits)."""
+    file_reference = file_reference.strip("\"'")
+    index = _file_index(files)
+
+    # Exact match
+    if file_reference in index.file_set:
+        return file_reference
+
+    # Filename match (without path): same basename first, then any path with that suffix
+    filename = file_reference.rsplit("/", 1)[-1]
+    file_path = index.by_basename.get(filename)
+    if file_path is not None:
+        return file_path
+    for file_path in index.files:
+        if file_path.endswith(filename):
+            return file_path
+
+    # Partial match (more strict)
+    if len(file_reference) > 3:  # Avoid matching very short strings
+        reference_lower = file_reference.lower()
+        if "\0" not in reference_lower and index.may_contain(reference_lower):
+            pos = index.haystack.find(reference_lower)
+            if pos >= 0:
+                return index.files[bisect_right(index.starts, pos) - 1]
+
+    # Extension match (only if filename part matches)
+    if "." in file_reference:
+        suffix = "." + file_reference.rsplit(".", 1)[-1]
+        filename_part = file_reference.split(".", 1)[0]
+        for file_path, basename in zip(index.files, index.basenames):
+            if file_path.endswith(suffix) and filename_part in basename:
+                return file_path
+
+    # No match found
+    return None
+
 
 class ExpansionProcessor:
     """Processes expansion requests and manages file preview state."""
 
     def __init__(self, preview_manager: FilePreviewManager):
         self.preview_manager = preview_manager
-        self.expansion_patterns = [
-            r"show me more of (.+)",
-            r"expand (.+)",
-            r"show more (.+)",
-            r"full content of (.+)",
-            r"complete (.+)",
-        ]
 
     def process_expansion_request(
         self, request: str, available_files: List[str]
@@ -32,73 +129,41 @@ class ExpansionProcessor:
         Returns:
             Tuple of (is_expansion_request, response_message, expanded_file)
         """
-        request_lower = request.lower().strip()
-
-        for pattern in self.expansion_patterns:
-            match = re.search(pattern, request_lower)
-            if match:
-                file_reference = match.group(1).strip()
-
-                # Try to find matching file
-                matched_file = self._find_matching_file(file_reference, available_files)
-
-                if matched_file:
-                    # Expand the file preview
-                    self.preview_manager.expand_file_preview(
-                        matched_file, 1000
-                    )  # Large number for "full" content
-                    return True, f"Expanded preview for {matched_file}", matched_file
-                else:
-                    return (
-                        True,
-                        f"File '{file_reference}' not found. Available files: {', '.join(available_files)}",
-                        None,
-                    )
-
-        return False, "", None
+        match = _EXPANSION_RE.search(request.strip())
+        if not match:
+            return False, "", None
 
-    def _find_matching_file(self, file_reference: str, available_files: List[str]) -> Optional[str]:
-        """Find the best matching file for a given reference."""
-        file_reference = file_reference.strip("\"'")
-
-        # Exact match
-        if file_reference in available_files:
-            return file_reference
-
-        # Filename match (without path)
-        filename = file_reference.split("/")[-1]
-        for file_path in available_files:
-            if file_path.endswith(filename):
-                return file_path
+        file_reference = match.group(1).strip()
 
-        # Partial match (more strict)
-        for file_path in available_files:
-            if (
-                file_reference.lower() in file_path.lower() and len(file_reference) > 3
-            ):  # Avoid matching very short strings
-                return file_path
+        # Try to find matching file
+        matched_file = self._find_matching_file(file_reference, available_files)
 
-        # Extension match (only if filename part matches)
-        if "." in file_reference:
-            ext = file_reference.split(".")[-1]
-            filename_part = file_reference.split(".")[0]
-            for file_path in available_files:
-                if file_path.endswith(f".{ext}") and filename_part in file_path.split("/")[-1]:
-                    return file_path
+        if matched_file:
+            # Expand the file preview
+            self.preview_manager.expand_file_preview(
+                matched_file, 1000
+            )  # Large number for "full" content
+            return True, f"Expanded preview for {matched_file}", matched_file
+        else:
+            return (
+                True,
+                f"File '{file_reference}' not found. Available files: {', '.join(available_files)}",
+                None,
+            )
 
-        # No match found
-        return None
+    def _find_matching_file(self, file_reference: str, available_files: List[str]) -> Optional[str]:
+        """Find the best matching file for a given reference."""
+        return _match_file(file_reference, tuple(available_files))
 
     def get_expansion_summary(self, file_contents: Dict[str, str]) -> str:
         """Get a summary of expansion opportunities."""
         summary_lines = []
+        max_lines = self.preview_manager.default_max_lines
 
         for filepath, content in file_contents.items():
-            lines = content.split("\n")
-            if len(lines) > self.preview_manager.default_max_lines:
-                summary_lines.append(
-                    f"- {filepath}: {len(lines)} lines (showing {self.preview_manager.default_max_lines})"
-                )
+            line_count = content.count("\n") + 1
+            if line_count > max_lines:
+                summary_lines.append(f"- {filepath}: {line_count} lines (showing {max_lines})")
 
         if summary_lines:
             return "Files with truncated content:\n" + "\n".join(summary_lines)
@@ -149,76 +214,124 @@ class SmartTruncation:
         Returns:
             Smartly truncated content
         """
-        lines = content.split("\n")
-        if len(lines) <= max_lines:
-            return content
-
-        # Identify important lines
-        important_lines = set()
-
-        if preserve_imports:
-            for i, line in enumerate(lines):
-                if line.strip().startswith(("import ", "from ")):
-                    important_lines.add(i)
-
-        if preserve_functions:
-            for i, line in enumerate(lines):
-                if re.match(r"^\s*def\s+\w+", line):
-                    important_lines.add(i)
-
-        if preserve_classes:
-            for i, line in enumerate(lines):
-                if re.match(r"^\s*class\s+\w+", line):
-                    important_lines.add(i)
-
-        # If we have too many important lines, fall back to regular truncation
-        if len(important_lines) > max_lines * 0.8:
+        truncated = _smart_truncate(
+            content, filepath, max_lines, preserve_imports, preserve_functions, preserve_classes
+        )
+        if truncated is None:
+            # Too many important lines: fall back to regular (expansion-aware) truncation
             return self.preview_manager.truncate_file_content(content, filepath, max_lines)
+        return truncated
+
+
+def _line_offsets(content: str) -> list[int]:
+    """Start offset of every line in content, found with one str.find scan."""
+    offsets = [0]
+    nl = content.find("\n")
+    while nl != -1:
+        offsets.append(nl + 1)
+        nl = content.find("\n", nl + 1)
+    return offsets
+
+
+def _join_runs(content: str, offsets: list[int], runs: list[tuple[int, int]]) -> str:
+    """Join runs of consecutive lines ([start, end) line indices), sliced straight from content."""
+    total = len(offsets)
+    return "\n".join(
+        content[offsets[start] : offsets[end] - 1 if end < total else len(content)]
+        for start, end in runs
+    )
+
+
+# A run of consecutive kept lines in a selection mask
+_KEPT_RUN_RE = re.compile(rb"\x01+")
+
+
+@lru_cache(maxsize=256)
+def _smart_truncate(
+    content: str,
+    filepath: str,
+    max_lines: int,
+    preserve_imports: bool,
+    preserve_functions: bool,
+    preserve_classes: bool,
+) -> Optional[str]:
+    """
+    Pure part of SmartTruncation.truncate_with_context, cached so unchanged files are
+    only processed once. Returns None when the caller should fall back to plain truncation.
+    """
+    # Files within the limit (the common case) only need a C-level newline count
+    if content.count("\n") < max_lines:
+        return content
+
+    offsets = _line_offsets(content)
+    total = len(offsets)
+
+    # Identify important lines; finditer yields them in file order, at most once per line
+    important_lines: list[int] = []
+
+    # A kind only needs the regex scan if its keyword occurs anywhere in the file at all;
+    # plain substring checks rule out most non-code files without running the regex
+    wanted = {
+        "imports": preserve_imports and ("import " in content or "from " in content),
+        "functions": preserve_functions and "def" in content,
+        "classes": preserve_classes and "class" in content,
+    }
+    if any(wanted.values()):
+        for match in _IMPORTANT_RE.finditer(content):
+            if wanted[match.lastgroup]:
+                important_lines.append(bisect_left(offsets, match.start()))
+
+    # If we have too many important lines, fall back to regular truncation
+    if len(important_lines) > max_lines * 0.8:
+        return None
 
-        # Build truncated content with important lines
-        result_lines = []
-        added_lines = set()
-
-        # Add important lines with context
-        for line_idx in sorted(important_lines):
-            if line_idx not in added_lines:
-                # Add context before
-                start = max(0, line_idx - 2)
-                end = min(len(lines), line_idx + 3)
-
-                for i in range(start, end):
-                    if i not in added_lines:
-                        result_lines.append(lines[i])
-                        added_lines.add(i)
-
-        # If we still have room, add more content
-        if len(result_lines) < max_lines:
-            remaining_lines = max_lines - len(result_lines)
-            # Add from the beginning and end
-            first_half = remaining_lines // 2
-            last_half = remaining_lines - first_half
-
-            for i in range(min(first_half, len(lines))):
-                if i not in added_lines:
-                    result_lines.insert(i, lines[i])
-                    added_lines.add(i)
-
-            for i in range(max(0, len(lines) - last_half), len(lines)):
-                if i not in added_lines:
-                    result_lines.append(lines[i])
-                    added_lines.add(i)
-
-        # Sort lines by original order
-        result_lines = [lines[i] for i in sorted(added_lines)]
-
-        # Add truncation indicator if needed
-        if len(result_lines) < len(lines):
-            truncated = (
-                result_lines[: len(result_lines) // 2]
-                + [f"... ({len(lines) - len(result_lines)} lines omitted) ..."]
-                + [f"[SHOW_MORE:{filepath}:{len(lines)}]"]
-                + result_lines[len(result_lines) // 2 :]
-            )
-            return "\n".join(truncated)
-
-        return "\n".join(result_lines)
+    # One byte per line marking whether it is kept; ranges are set with C-level slice fills
+    kept = bytearray(total)
+
+    # Add important lines with context (lines already shown as context don't add their own)
+    for line_idx in important_lines:
+        if not kept[line_idx]:
+            start, end = max(0, line_idx - 2), min(total, line_idx + 3)
+            kept[start:end] = b"\x01" * (end - start)
+    kept_count = kept.count(1)
+
+    # If we still have room, add more content from the beginning and end
+    if kept_count < max_lines:
+        remaining_lines = max_lines - kept_count
+        first_half = remaining_lines // 2
+        last_half = remaining_lines - first_half
+
+        head_end = min(first_half, total)
+        tail_start = max(0, total - last_half)
+        kept[:head_end] = b"\x01" * head_end
+        kept[tail_start:] = b"\x01" * (total - tail_start)
+        kept_count = kept.count(1)
+
+    if kept_count == total:
+        return content
+
+    # Split the kept runs at the middle kept line and put the truncation indicator there
+    half = kept_count // 2
+    before: list[tuple[int, int]] = []
+    after: list[tuple[int, int]] = []
+    seen = 0
+    for run in _KEPT_RUN_RE.finditer(kept):
+        start, end = run.span()
+        if seen >= half:
+            after.append((start, end))
+        elif seen + end - start <= half:
+            before.append((start, end))
+        else:
+            split = start + half - seen
+            before.append((start, split))
+            after.append((split, end))
+        seen += end - start
+
+    parts = []
+    if before:
+        parts.append(_join_runs(content, offsets, before))
+    parts.append(f"... ({total - kept_count} lines omitted) ...")
+    parts.append(f"[SHOW_MORE:{filepath}:{total}]")
+    if after:
+        parts.append(_join_runs(content, offsets, after))
+    return "\n".join(parts)
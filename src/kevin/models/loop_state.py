@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+
+__all__ = ["LoopState", "StepResult", "StepStatus", "StepType"]
 
 
 class StepType(str, Enum):
@@ -27,7 +30,20 @@ class StepStatus(str, Enum):
     SKIPPED = "skipped"
 
 
-class StepResult(BaseModel):
+# Order of steps within one iteration of the workflow
+_STEP_TYPES = (
+    StepType.PLAN,
+    StepType.FETCH_FILES,
+    StepType.PROPOSE_PATCH,
+    StepType.APPLY,
+    StepType.RUN_TESTS,
+    StepType.REFLECT,
+)
+_CYCLE_LENGTH = len(_STEP_TYPES)
+
+
+@dataclass(slots=True)
+class StepResult:
     """Result of a single step execution."""
 
     step_type: StepType
@@ -35,12 +51,15 @@ class StepResult(BaseModel):
     output: Optional[str] = None
     error: Optional[str] = None
     duration_s: Optional[float] = None
-    metadata: Dict[str, Any] = Field(default_factory=dict)
+    metadata: Dict[str, Any] = field(default_factory=dict)
 
 
 class LoopState(BaseModel):
     """State management for the agent execution loop."""
 
+    # Build the validation schema on first use rather than at import time
+    model_config = ConfigDict(defer_build=True)
+
     # Loop configuration
     max_steps: int = Field(default=15, description="Maximum number of steps allowed")
     current_step: int = Field(default=0, description="Current step number (0-based)")
@@ -57,6 +76,10 @@ class LoopState(BaseModel):
     step_results: List[StepResult] = Field(
         default_factory=list, description="History of step results"
     )
+    # Derived from step_results: rebuilt on construction, then kept current by add_step_result
+    _status_counts: Dict[StepStatus, int] = PrivateAttr(default_factory=dict)
+    _last_apply_failure: Optional[StepResult] = PrivateAttr(default=None)
+    _last_failed_step: Optional[StepResult] = PrivateAttr(default=None)
 
     # Current iteration state
     current_plan: Optional[Any] = None  # Will be Plan object
@@ -67,6 +90,10 @@ class LoopState(BaseModel):
     total_duration_s: float = Field(default=0.0, description="Total execution time")
     tokens_used: int = Field(default=0, description="Total tokens consumed")
 
+    def model_post_init(self, __context: Any) -> None:
+        for result in self.step_results:
+            self._index_step_result(result)
+
     def can_continue(self) -> bool:
         """Check if the loop can continue."""
         return (
@@ -79,30 +106,47 @@ class LoopState(BaseModel):
     def add_step_result(self, result: StepResult) -> None:
         """Add a step result to the history."""
         self.step_results.append(result)
+        self._index_step_result(result)
         if result.duration_s:
             self.total_duration_s += result.duration_s
 
+    def _index_step_result(self, result: StepResult) -> None:
+        """Fold one recorded result into the per-status counts and last-failure lookups."""
+        self._status_counts[result.status] = self._status_counts.get(result.status, 0) + 1
+        if result.status == StepStatus.FAILED:
+            self._last_failed_step = result
+            if result.step_type == StepType.APPLY:
+                self._last_apply_failure = result
+
     def get_last_step_result(self) -> Optional[StepResult]:
         """Get the last step result."""
         return self.step_results[-1] if self.step_results else None
 
+    def get_status_count(self, status: StepStatus) -> int:
+        """Get the number of recorded step results with the given status."""
+        return self._status_counts.get(status, 0)
+
     def get_last_failed_step(self) -> Optional[StepResult]:
         """Get the last failed step."""
-        for result in reversed(self.step_results):
-            if result.status == StepStatus.FAILED:
-                return result
-        return None
+        return self._last_failed_step
+
+    def get_last_apply_failure(self) -> Optional[StepResult]:
+        """Get the most recent failed apply step."""
+        return self._last_apply_failure
 
     def get_test_output_tail(self, lines: int = 200) -> str:
         """Get the last N lines of test output."""
         if not self.test_output:
             return ""
 
-        output_lines = self.test_output.split("\n")
-        if len(output_lines) <= lines:
-            return self.test_output
-
-        return "\n".join(output_lines[-lines:])
+        # Walk back from the end to the Nth-from-last newline instead of splitting everything
+        output = self.test_output
+        end = len(output)
+        for _ in range(lines):
+            end = output.rfind("\n", 0, end)
+            if end < 0:
+                return output
+        return output[end + 1 :]
 
     def mark_completed(self) -> None:
         """Mark the loop as completed successfully."""
@@ -124,32 +168,26 @@ class LoopState(BaseModel):
 
     def get_step_type_for_iteration(self) -> StepType:
         """Get the step type for the current iteration based on step number."""
-        step_in_cycle = self.current_step % 6
-        step_types = [
-            StepType.PLAN,
-            StepType.FETCH_FILES,
-            StepType.PROPOSE_PATCH,
-            StepType.APPLY,
-            StepType.RUN_TESTS,
-            StepType.REFLECT,
-        ]
-        return step_types[step_in_cycle]
+        return _STEP_TYPES[self.current_step % _CYCLE_LENGTH]
 
     def get_iteration_number(self) -> int:
         """Get the current iteration number (0-based)."""
-        return self.current_step // 6
+        return self.current_step // _CYCLE_LENGTH
 
     def is_first_iteration(self) -> bool:
         """Check if this is the first iteration."""
         return self.get_iteration_number() == 0
 
+    def _cycle(self) -> tuple[int, int]:
+        """(iteration number, position within the iteration) for the current step."""
+        return divmod(self.current_step, _CYCLE_LENGTH)
+
     def get_summary(self) -> str:
         """Get a summary of the current loop state."""
-        iteration = self.get_iteration_number()
-        step_in_cycle = self.current_step % 6
-        step_type = self.get_step_type_for_iteration()
+        iteration, step_in_cycle = self._cycle()
+        step_type = _STEP_TYPES[step_in_cycle]
 
         return (
-            f"Iteration {iteration + 1}, Step {step_in_cycle + 1}/6 ({step_type.value}) - "
-            f"Total steps: {self.current_step}/{self.max_steps}"
+            f"Iteration {iteration + 1}, Step {step_in_cycle + 1}/{_CYCLE_LENGTH} "
+            f"({step_type.value}) - Total steps: {self.current_step}/{self.max_steps}"
         )
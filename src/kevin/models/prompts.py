@@ -1,15 +1,34 @@
 from __future__ import annotations
 
+import re
+from collections.abc import Iterator
+from io import StringIO
+from string import Formatter
 from typing import Dict, List, Optional
 
+# Truncated previews kept per FilePreviewManager; the oldest entry is evicted first
+_TRUNCATION_CACHE_SIZE = 128
+
+_SHOW_MORE_RE = re.compile(r"\[SHOW_MORE:([^:]+):(\d+)\]")
+
 
 class FilePreviewManager:
     """Manages file previews with configurable limits and expansion capabilities."""
 
+    __slots__ = (
+        "default_max_lines",
+        "default_context_lines",
+        "expanded_files",
+        "version",
+        "_truncation_cache",
+    )
+
     def __init__(self, default_max_lines: int = 50, default_context_lines: int = 5):
         self.default_max_lines = default_max_lines
         self.default_context_lines = default_context_lines
         self.expanded_files: Dict[str, int] = {}  # filepath -> expanded line count
+        self.version = 0  # bumped on every expansion change
+        self._truncation_cache: Dict[tuple, tuple[str, Optional[str]]] = {}
 
     def truncate_file_content(
         self,
@@ -30,65 +49,153 @@ class FilePreviewManager:
         Returns:
             Truncated content with expansion hints
         """
+        return self._truncate_with_hint(content, filepath, max_lines, context_lines)[0]
+
+    def _truncate_with_hint(
+        self,
+        content: str,
+        filepath: str,
+        max_lines: Optional[int] = None,
+        context_lines: Optional[int] = None,
+    ) -> tuple[str, Optional[str]]:
+        """
+        Like truncate_file_content, but also return the "filepath:total_lines" expansion hint
+        when the content was truncated (None otherwise), so callers needn't re-scan for it.
+        """
         if max_lines is None:
             max_lines = self.default_max_lines
         if context_lines is None:
             context_lines = self.default_context_lines
 
-        lines = content.split("\n")
-        if len(lines) <= max_lines:
-            return content
+        key = (filepath, max_lines, content)
+        cached = self._truncation_cache.get(key)
+        if cached is None:
+            cached = self._truncation_cache[key] = self._truncate_uncached(
+                content, filepath, max_lines
+            )
+            if len(self._truncation_cache) > _TRUNCATION_CACHE_SIZE:
+                del self._truncation_cache[next(iter(self._truncation_cache))]
+        return cached
+
+    def _truncate_uncached(
+        self, content: str, filepath: str, max_lines: int
+    ) -> tuple[str, Optional[str]]:
+        total_lines = content.count("\n") + 1
+        if total_lines <= max_lines:
+            return content, None
 
         # Check if this file has been expanded
-        if filepath in self.expanded_files:
-            expanded_lines = self.expanded_files[filepath]
-            if len(lines) <= expanded_lines:
-                return content
+        expanded_lines = self.expanded_files.get(filepath)
+        if expanded_lines is not None:
+            if total_lines <= expanded_lines:
+                return content, None
             max_lines = expanded_lines
 
         first_half = max_lines // 2
         last_half = max_lines - first_half
 
-        truncated = (
-            lines[:first_half]
-            + [f"... ({len(lines) - max_lines} lines omitted) ..."]
-            + [f"[SHOW_MORE:{filepath}:{len(lines)}]"]  # Expansion hint
-            + lines[-last_half:]
+        truncated = _join_head_tail(
+            content,
+            first_half,
+            last_half,
+            f"... ({total_lines - max_lines} lines omitted) ...",
+            f"[SHOW_MORE:{filepath}:{total_lines}]",  # Expansion hint
         )
-        return "\n".join(truncated)
+        return truncated, f"{filepath}:{total_lines}"
 
     def expand_file_preview(self, filepath: str, target_lines: int) -> None:
         """Mark a file for expanded preview."""
         self.expanded_files[filepath] = target_lines
+        self.version += 1
+        self._truncation_cache.clear()
 
     def reset_expansions(self) -> None:
         """Reset all file expansions."""
         self.expanded_files.clear()
+        self.version += 1
+        self._truncation_cache.clear()
 
     def get_expansion_hints(self, content: str) -> List[str]:
         """Extract expansion hints from content."""
-        import re
+        if "[SHOW_MORE:" not in content:
+            return []
+        return [f"{filepath}:{lines}" for filepath, lines in _SHOW_MORE_RE.findall(content)]
+
+
+class PromptTemplate:
+    """A `str.format`-style prompt split into (literal, field) chunks once, at import time."""
+
+    __slots__ = ("text", "_parts")
+
+    def __init__(self, text: str):
+        self.text = text
+        self._parts = tuple(
+            (literal, field) for literal, field, _spec, _conv in Formatter().parse(text)
+        )
+
+    def render(self, **values: object) -> str:
+        """Equivalent to `text.format(**values)` without re-parsing the template."""
+        return "".join(
+            literal if field is None else literal + str(values[field])
+            for literal, field in self._parts
+        )
 
-        pattern = r"\[SHOW_MORE:([^:]+):(\d+)\]"
-        matches = re.findall(pattern, content)
-        return [f"{filepath}:{lines}" for filepath, lines in matches]
+
+def _join_head_tail(content: str, first_half: int, last_half: int, *markers: str) -> str:
+    """
+    Join the first `first_half` and last `last_half` lines of content around marker lines.
+    The head and tail are located with str.find/rfind and sliced out directly, so the file
+    is never split into a list of lines. The caller guarantees content has more lines than
+    first_half + last_half.
+    """
+    joined = "\n".join(markers)
+    if first_half:
+        head_end = -1
+        for _ in range(first_half):
+            head_end = content.find("\n", head_end + 1)
+        joined = f"{content[:head_end]}\n{joined}"
+    if last_half:
+        tail_start = len(content)
+        for _ in range(last_half):
+            tail_start = content.rfind("\n", 0, tail_start)
+        joined = f"{joined}\n{content[tail_start + 1 :]}"
+    return joined
 
 
 def truncate_file_content(content: str, max_lines: int = 50) -> str:
     """Legacy function for backward compatibility."""
-    lines = content.split("\n")
-    if len(lines) <= max_lines:
+    total_lines = content.count("\n") + 1
+    if total_lines <= max_lines:
         return content
 
     first_half = max_lines // 2
     last_half = max_lines - first_half
 
-    truncated = (
-        lines[:first_half]
-        + [f"... ({len(lines) - max_lines} lines omitted) ..."]
-        + lines[-last_half:]
+    return _join_head_tail(
+        content, first_half, last_half, f"... ({total_lines - max_lines} lines omitted) ..."
     )
-    return "\n".join(truncated)
+
+
+def iter_file_contents(
+    file_contents: dict[str, str],
+    max_lines: int = 50,
+    preview_manager: Optional[FilePreviewManager] = None,
+) -> Iterator[str]:
+    """
+    Yield one formatted "=== path ===" block per file, truncating lazily, so a caller working
+    to a token budget can stop before the remaining files are formatted. A file whose content
+    is identical to an earlier one is emitted as a "[duplicate of ...]" reference instead.
+    """
+    first_seen: dict[str, str] = {}  # content -> first filepath with that content
+    for filepath, content in file_contents.items():
+        original = first_seen.setdefault(content, filepath) if content else filepath
+        if original != filepath:
+            truncated = f"[duplicate of {original}]"
+        elif preview_manager:
+            truncated = preview_manager.truncate_file_content(content, filepath, max_lines)
+        else:
+            truncated = truncate_file_content(content, max_lines)
+        yield f"=== {filepath} ===\n{truncated}\n"
 
 
 def format_file_contents(
@@ -100,15 +207,7 @@ def format_file_contents(
     if not file_contents:
         return "No files read yet."
 
-    formatted = []
-    for filepath, content in file_contents.items():
-        if preview_manager:
-            truncated = preview_manager.truncate_file_content(content, filepath, max_lines)
-        else:
-            truncated = truncate_file_content(content, max_lines)
-        formatted.append(f"=== {filepath} ===\n{truncated}\n")
-
-    return "\n".join(formatted)
+    return "\n".join(iter_file_contents(file_contents, max_lines, preview_manager))
 
 
 def format_file_contents_with_expansion(
@@ -118,31 +217,41 @@ def format_file_contents_with_expansion(
     if not file_contents:
         return "No files read yet."
 
-    formatted = []
+    buf = StringIO()
+    separator = ""
     expansion_hints = []
+    first_seen: dict[str, str] = {}  # content -> first filepath with that content
 
     for filepath, content in file_contents.items():
-        truncated = preview_manager.truncate_file_content(content, filepath, max_lines)
-        formatted.append(f"=== {filepath} ===\n{truncated}\n")
+        original = first_seen.setdefault(content, filepath) if content else filepath
+        if original != filepath:
+            truncated, hint = f"[duplicate of {original}]", None
+        else:
+            truncated, hint = preview_manager._truncate_with_hint(content, filepath, max_lines)
+        buf.write(f"{separator}=== {filepath} ===\n")
+        buf.write(truncated)
+        buf.write("\n")
+        separator = "\n"
 
         # Collect expansion hints
-        hints = preview_manager.get_expansion_hints(truncated)
-        expansion_hints.extend(hints)
-
-    result = "\n".join(formatted)
+        if hint is not None:
+            expansion_hints.append(hint)
 
     # Add expansion summary if there are hints
     if expansion_hints:
-        result += "\n\n[EXPANSION_HINTS]\n"
+        buf.write("\n\n[EXPANSION_HINTS]\n")
         for hint in expansion_hints:
-            result += f"- {hint}\n"
-        result += "\nUse 'show me more of <filepath>' to expand file previews.\n"
+            buf.write(f"- {hint}\n")
+        buf.write("\nUse 'show me more of <filepath>' to expand file previews.\n")
 
-    return result
+    return buf.getvalue()
 
 
-def format_command_results(command_results: list[dict]) -> str:
-    """Format command execution results for model consumption."""
+def format_command_results(command_results: list[dict], max_lines: int = 100) -> str:
+    """
+    Format command execution results for model consumption. Each stdout/stderr stream is
+    cut down to its first and last lines (max_lines in total) so noisy runs stay bounded.
+    """
     if not command_results:
         return "No commands executed yet."
 
@@ -150,16 +259,14 @@ def format_command_results(command_results: list[dict]) -> str:
     for i, result in enumerate(command_results, 1):
         cmd = result.get("command", "unknown")
         rc = result.get("returncode", -1)
-        stdout = result.get("stdout", "").strip()
-        stderr = result.get("stderr", "").strip()
+        stdout = truncate_file_content(result.get("stdout", "").strip(), max_lines)
+        stderr = truncate_file_content(result.get("stderr", "").strip(), max_lines)
 
-        formatted.append(f"Command {i}: {cmd}")
-        formatted.append(f"Exit code: {rc}")
-        if stdout:
-            formatted.append(f"Output: {stdout}")
-        if stderr:
-            formatted.append(f"Error: {stderr}")
-        formatted.append("")
+        formatted.append(
+            f"Command {i}: {cmd}\nExit code: {rc}\n"
+            + (f"Output: {stdout}\n" if stdout else "")
+            + (f"Error: {stderr}\n" if stderr else "")
+        )
 
     return "\n".join(formatted)
 
@@ -300,3 +407,9 @@ Respond with a JSON object in this exact format:
     "should_retry": true,
     "recovery_strategy": "regenerate_patch|direct_edit|incremental_patches|reread_files|file_edits"
 }}"""
+
+
+PLAN_TEMPLATE = PromptTemplate(PLAN_PROMPT)
+PATCH_TEMPLATE = PromptTemplate(PATCH_PROMPT)
+REFLECT_TEMPLATE = PromptTemplate(REFLECT_PROMPT)
+REFLECT_PATCH_FAILURE_TEMPLATE = PromptTemplate(REFLECT_PATCH_FAILURE_PROMPT)
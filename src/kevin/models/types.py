@@ -3,7 +3,7 @@ from __future__ import annotations
 from enum import Enum
 from typing import Optional
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
 
 
 class RecoveryStrategy(str, Enum):
@@ -23,13 +23,15 @@ class Plan(BaseModel):
     commands_to_run: list[str] = Field(description="List of shell commands to execute")
     rationale: str = Field(description="Explanation of the approach and reasoning")
 
-    @validator("files_to_read")
+    @field_validator("files_to_read")
+    @classmethod
     def validate_files(cls, v):
         if not v:
             raise ValueError("Must specify at least one file to read")
         return v
 
-    @validator("commands_to_run")
+    @field_validator("commands_to_run")
+    @classmethod
     def validate_commands(cls, v):
         if not v:
             raise ValueError("Must specify at least one command to run")
@@ -49,17 +51,19 @@ class Patch(BaseModel):
 
     unified_diff: str = Field(description="Unified diff format patch")
 
-    @validator("unified_diff")
+    @field_validator("unified_diff")
+    @classmethod
     def validate_diff_format(cls, v):
         # Basic validation for unified diff format
-        if not v.strip():
+        if not v or v.isspace():
             raise ValueError("Patch cannot be empty")
 
-        # Check for unified diff markers
-        lines = v.strip().split("\n")
-        if not any(line.startswith("---") for line in lines):
+        # Check for unified diff markers at the start of any line.
+        # lstrip() hands back v itself unless there is leading whitespace, so no copy is made.
+        head = v.lstrip()
+        if not (head.startswith("---") or "\n---" in v):
             raise ValueError("Patch must contain '---' markers for unified diff format")
-        if not any(line.startswith("+++") for line in lines):
+        if not (head.startswith("+++") or "\n+++" in v):
             raise ValueError("Patch must contain '+++' markers for unified diff format")
 
         return v
@@ -70,7 +74,8 @@ class FileEdits(BaseModel):
 
     edits: list[FileEdit] = Field(description="List of file edits to apply")
 
-    @validator("edits")
+    @field_validator("edits")
+    @classmethod
     def validate_edits(cls, v):
         if not v:
             raise ValueError("Must specify at least one file edit")
@@ -112,6 +117,17 @@ class ModelContext(BaseModel):
         default=True, description="Whether to use smart truncation"
     )
 
+    # Bumped whenever file_contents changes so formatted previews can be reused in between
+    _file_contents_version: int = PrivateAttr(default=0)
+
+    @property
+    def file_contents_version(self) -> int:
+        return self._file_contents_version
+
+    def mark_file_contents_changed(self) -> None:
+        """Call after mutating file_contents in place."""
+        self._file_contents_version += 1
+
 
 class CmdResult(BaseModel):
     """Result of a command execution."""
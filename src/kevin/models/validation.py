@@ -2,16 +2,199 @@ from __future__ import annotations
 
 import json
 import re
-from typing import Any, Dict, List, Optional, Union
+from collections.abc import Callable, Mapping
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, ClassVar, Dict, List, Optional, Union, get_origin
 
 from pydantic import BaseModel, ValidationError
 
+try:  # Optional: faster parsing of well-formed responses
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+# JSON extraction and repair patterns, compiled once at import
+_JSON_STRUCTURE_RE = re.compile(r'[{}"]|\\.', re.DOTALL)  # braces, quotes, escape pairs
+_JSON_GREEDY_RE = re.compile(r"\{.*\}", re.DOTALL)
+# One left-to-right scan for _fix_common_json_issues. Double-quoted strings are matched
+# (and kept verbatim) first, so nothing inside them is rewritten.
+_JSON_FIX_RE = re.compile(
+    r"""(?P<string>"(?:[^"\\]|\\.)*"?)"""
+    r"|'(?P<single>[^']*)'"
+    r"|(?P<key>\w+):"
+    r"|\b(?P<literal>True|False|None)\b"
+    r"|(?P<comma>,)(?=\s*[}\]])"
+)
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+# Key/value fallback for responses that aren't parseable JSON at all: one scan over
+# "key": "str" | true/false | [array] and key: [array] | "str" | bare value. Bare values
+# can't start with a brace or quote and end at a comma, bracket or newline, or just
+# before the next key: so they can't swallow a following pair.
+_KV_RE = re.compile(
+    r'"(?P<key>[^"]+)"\s*:\s*'
+    r'(?:"(?P<string>[^"]*)"|(?P<boolean>(?i:true|false))|\[(?P<array>.*?)\])'
+    r"|(?P<ukey>\w+)\s*:\s*"
+    r'(?:\[(?P<uarray>.*?)\]|"(?P<ustring>[^"]*)"'
+    r'|(?P<uvalue>[^,\[\]{}"\s](?:(?!\s+"?\w+"?\s*:)[^,\[\]\n])*))',
+    re.DOTALL,
+)
+
+_DIFF_HEADER_PREFIXES = ("---", "+++", "@@")
+
+_DIFF_FILE_HEADER_RE = re.compile(r"^(---|\+\+\+)\s+(.+)")
+_DIFF_HUNK_HEADER_RE = re.compile(r"^@@\s+-(\d+)(?:,(\d+))?\s+\+(\d+)(?:,(\d+))?\s+@@")
+
+# path/to/name.ext; must start with a letter or underscore so "1.1" in hunk text is skipped
+_FILE_PATH_RE = re.compile(r"[A-Za-z_][\w/.-]*\.[A-Za-z]\w*")
+
+
+def _find_balanced_object(text: str) -> Optional[tuple[int, int]]:
+    """
+    Return the (start, end) span of the first brace-balanced {...} in text, or None.
+    Braces inside string literals (including escaped quotes) are ignored; only braces,
+    quotes and backslash pairs are visited, so the scan is linear with no backtracking.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+    depth = 0
+    in_string = False
+    for token in _JSON_STRUCTURE_RE.finditer(text, start):
+        char = token.group()
+        if char == '"':
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return start, token.end()
+    return None
+
+
+def _fix_json_token(match: re.Match) -> str:
+    kind = match.lastgroup
+    if kind == "single":
+        return '"' + match.group("single").replace('"', '\\"') + '"'
+    if kind == "key":
+        return f'"{match.group("key")}":'
+    if kind == "literal":
+        return _PYTHON_LITERALS[match.group("literal")]
+    if kind == "comma":
+        return ""
+    return match.group()
+
+
+def _to_list(value: Any) -> list:
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str):
+        # Try to split string into array
+        return [item.strip() for item in value.split(",")]
+    return [str(value)]
+
+
+def _to_str(value: Any) -> str:
+    return value if isinstance(value, str) else str(value)
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return value.lower() in ("true", "yes", "1")
+    return bool(value)
+
+
+# Meaningful defaults for arrays
+_ARRAY_DEFAULTS = {
+    "files_to_read": ("README.md", "main.py"),
+    "commands_to_run": ("ls -la", "git status"),
+}
+
+# Schema type -> converter, and the filler used when a required field of that type is missing
+_TYPE_REPAIRS: dict[str, tuple[Callable[[Any], Any], Callable[[str], Any]]] = {
+    "array": (_to_list, lambda field: list(_ARRAY_DEFAULTS.get(field, ()))),
+    "string": (_to_str, lambda field: f"Auto-generated {field}"),
+    "boolean": (_to_bool, lambda field: True),
+}
+
+
+_SCHEMA_TYPES = {"array": list, "string": str, "boolean": bool}
+
+
+def _schema_check(schema: Mapping[str, Any]) -> tuple[frozenset, tuple]:
+    """Resolve a schema to (required field names, (field, python type) pairs)."""
+    types = tuple(
+        (field, _SCHEMA_TYPES[field_schema["type"]])
+        for field, field_schema in schema.get("properties", {}).items()
+        if field_schema.get("type") in _SCHEMA_TYPES
+    )
+    return frozenset(schema.get("required", ())), types
+
+
+def _schema_repair_plan(schema: Mapping[str, Any]) -> tuple[tuple, tuple]:
+    """
+    Resolve a schema's type dispatch once: ((field, default_factory) for each required
+    field, (field, converter) for each typed property).
+    """
+    properties = schema.get("properties", {})
+    fillers = []
+    for field in schema.get("required", []):
+        repair = _TYPE_REPAIRS.get(properties.get(field, {}).get("type"))
+        if repair is not None:
+            fillers.append((field, repair[1]))
+    converters = tuple(
+        (field, _TYPE_REPAIRS[field_schema["type"]][0])
+        for field, field_schema in properties.items()
+        if field_schema.get("type") in _TYPE_REPAIRS
+    )
+    return tuple(fillers), converters
+
+
+# Pydantic error types handled by _repair_model_data (current names, then legacy v1 ones)
+_MISSING_ERRORS = frozenset({"missing", "value_error.missing"})
+_TYPE_ERRORS = frozenset(
+    {
+        "string_type",
+        "int_type",
+        "int_parsing",
+        "bool_type",
+        "bool_parsing",
+        "type_error.str",
+        "type_error.integer",
+        "type_error.boolean",
+    }
+)
+
+
+@lru_cache(maxsize=32)
+def _model_field_table(model_class: type[BaseModel]) -> Mapping[str, tuple[Any, Any]]:
+    """
+    Field name -> (bare python type, default or None) for a model, introspected once.
+    `list[str]` is reduced to `list` so repairs can dispatch on the container type.
+    """
+    return MappingProxyType(
+        {
+            name: (
+                get_origin(info.annotation) or info.annotation,
+                None if info.is_required() else info.default,
+            )
+            for name, info in model_class.model_fields.items()
+        }
+    )
+
 
 class JSONValidator:
     """Enhanced JSON validation with schema validation and auto-repair capabilities."""
 
-    def __init__(self):
-        self.schemas = {
+    # Built once for the class; read-only so validators can't mutate shared state
+    schemas: ClassVar[Mapping[str, dict]] = MappingProxyType(
+        {
             "plan": {
                 "type": "object",
                 "required": ["files_to_read", "commands_to_run", "rationale"],
@@ -31,6 +214,13 @@ class JSONValidator:
                 },
             },
         }
+    )
+    _schema_checks: ClassVar[Mapping[str, tuple]] = MappingProxyType(
+        {name: _schema_check(schema) for name, schema in schemas.items()}
+    )
+    _repair_plans: ClassVar[Mapping[str, tuple]] = MappingProxyType(
+        {name: _schema_repair_plan(schema) for name, schema in schemas.items()}
+    )
 
     def validate_and_repair_json(
         self, text: str, expected_schema: str, model_class: type[BaseModel]
@@ -64,16 +254,27 @@ class JSONValidator:
 
     def _extract_json(self, text: str) -> Dict[str, Any]:
         """Extract JSON object from text using multiple strategies."""
+        # Fast path: the whole response is a well-formed JSON object
+        stripped = text.strip()
+        if stripped.startswith("{") and stripped.endswith("}"):
+            try:
+                data = _json_loads(stripped)
+            except ValueError:
+                pass
+            else:
+                if isinstance(data, dict):
+                    return data
+
         # Strategy 1: Look for complete JSON object
-        json_match = re.search(r"\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}", text, re.DOTALL)
-        if json_match:
+        span = _find_balanced_object(text)
+        if span is not None:
             try:
-                return json.loads(json_match.group())
+                return json.loads(text[span[0] : span[1]])
             except json.JSONDecodeError:
                 pass
 
         # Strategy 2: Look for JSON with potential formatting issues
-        json_match = re.search(r"\{.*\}", text, re.DOTALL)
+        json_match = _JSON_GREEDY_RE.search(text)
         if json_match:
             json_str = json_match.group()
             # Try to fix common JSON issues
@@ -87,140 +288,72 @@ class JSONValidator:
         return self._extract_key_value_pairs(text)
 
     def _fix_common_json_issues(self, json_str: str) -> str:
-        """Fix common JSON formatting issues."""
-        # Remove trailing commas
-        json_str = re.sub(r",(\s*[}\]])", r"\1", json_str)
-
-        # Fix single quotes to double quotes
-        json_str = re.sub(r"'([^']*)'", r'"\1"', json_str)
-
-        # Fix unquoted keys
-        json_str = re.sub(r"(\w+):", r'"\1":', json_str)
-
-        # Fix boolean values
-        json_str = re.sub(r"\bTrue\b", "true", json_str)
-        json_str = re.sub(r"\bFalse\b", "false", json_str)
-        json_str = re.sub(r"\bNone\b", "null", json_str)
-
-        return json_str
+        """
+        Fix common JSON formatting issues in a single pass: trailing commas, single-quoted
+        strings, unquoted keys and Python True/False/None literals.
+        """
+        return _JSON_FIX_RE.sub(_fix_json_token, json_str)
 
     def _extract_key_value_pairs(self, text: str) -> Dict[str, Any]:
-        """Extract key-value pairs using regex patterns."""
+        """Extract key-value pairs using a single regex scan."""
         data = {}
 
-        # Pattern for quoted keys and values
-        pattern = r'"([^"]+)"\s*:\s*"([^"]*)"'
-        matches = re.findall(pattern, text)
-        for key, value in matches:
+        for match in _KV_RE.finditer(text):
+            kind = match.lastgroup
+            key = match.group("key") or match.group("ukey")
+            if kind == "string":
+                value = match.group("string")
+            elif kind == "boolean":
+                value = match.group("boolean").lower() == "true"
+            elif kind in ("array", "uarray"):
+                # Simple array parsing - split by comma and clean up
+                items = [item.strip().strip("\"'") for item in match.group(kind).split(",")]
+                value = [item for item in items if item]
+            else:
+                # Unquoted strings don't override existing values
+                if key not in data:
+                    data[key] = match.group(kind).strip().strip("\"'")
+                continue
             data[key] = value
 
-        # Pattern for boolean values
-        bool_pattern = r'"([^"]+)"\s*:\s*(true|false)'
-        bool_matches = re.findall(bool_pattern, text, re.IGNORECASE)
-        for key, value in bool_matches:
-            data[key] = value.lower() == "true"
-
-        # Pattern for arrays - more flexible
-        array_pattern = r'"([^"]+)"\s*:\s*\[(.*?)\]'
-        array_matches = re.findall(array_pattern, text, re.DOTALL)
-        for key, array_content in array_matches:
-            # Simple array parsing - split by comma and clean up
-            items = [item.strip().strip("\"'") for item in array_content.split(",")]
-            data[key] = [item for item in items if item]
-
-        # Pattern for unquoted arrays (like our test case)
-        unquoted_array_pattern = r"(\w+)\s*:\s*\[(.*?)\]"
-        unquoted_matches = re.findall(unquoted_array_pattern, text, re.DOTALL)
-        for key, array_content in unquoted_matches:
-            items = [item.strip().strip("\"'") for item in array_content.split(",")]
-            data[key] = [item for item in items if item]
-
-        # Pattern for unquoted strings
-        unquoted_string_pattern = r"(\w+)\s*:\s*([^,\[\]]+)"
-        unquoted_string_matches = re.findall(unquoted_string_pattern, text)
-        for key, value in unquoted_string_matches:
-            value = value.strip().strip("\"'")
-            if key not in data:  # Don't override existing values
-                data[key] = value
-
         return data
 
     def _validate_schema(self, data: Dict[str, Any], schema_name: str) -> bool:
         """Basic schema validation."""
-        if schema_name not in self.schemas:
+        check = self._schema_checks.get(schema_name)
+        if check is None:
             return True  # No schema to validate against
-
-        schema = self.schemas[schema_name]
-        required_fields = schema.get("required", [])
+        required, types = check
 
         # Check required fields
-        for field in required_fields:
-            if field not in data:
-                return False
+        if not required <= data.keys():
+            return False
 
         # Check field types
-        properties = schema.get("properties", {})
-        for field, field_schema in properties.items():
-            if field in data:
-                expected_type = field_schema.get("type")
-                if expected_type == "array" and not isinstance(data[field], list):
-                    return False
-                elif expected_type == "string" and not isinstance(data[field], str):
-                    return False
-                elif expected_type == "boolean" and not isinstance(data[field], bool):
-                    return False
+        for field, expected_type in types:
+            if field in data and not isinstance(data[field], expected_type):
+                return False
 
         return True
 
     def _repair_schema_data(self, data: Dict[str, Any], schema_name: str) -> Dict[str, Any]:
         """Repair data to match schema requirements."""
-        if schema_name not in self.schemas:
+        plan = self._repair_plans.get(schema_name)
+        if plan is None:
             return data
-
-        schema = self.schemas[schema_name]
-        required_fields = schema.get("required", [])
-        properties = schema.get("properties", {})
+        fillers, converters = plan
 
         repaired = data.copy()
 
         # Add missing required fields with defaults
-        for field in required_fields:
+        for field, default in fillers:
             if field not in repaired:
-                field_schema = properties.get(field, {})
-                field_type = field_schema.get("type")
-
-                if field_type == "array":
-                    # Provide meaningful defaults for arrays
-                    if field == "files_to_read":
-                        repaired[field] = ["README.md", "main.py"]
-                    elif field == "commands_to_run":
-                        repaired[field] = ["ls -la", "git status"]
-                    else:
-                        repaired[field] = []
-                elif field_type == "string":
-                    repaired[field] = f"Auto-generated {field}"
-                elif field_type == "boolean":
-                    repaired[field] = True
+                repaired[field] = default(field)
 
         # Fix type mismatches
-        for field, field_schema in properties.items():
+        for field, convert in converters:
             if field in repaired:
-                field_type = field_schema.get("type")
-                value = repaired[field]
-
-                if field_type == "array" and not isinstance(value, list):
-                    if isinstance(value, str):
-                        # Try to split string into array
-                        repaired[field] = [item.strip() for item in value.split(",")]
-                    else:
-                        repaired[field] = [str(value)]
-                elif field_type == "string" and not isinstance(value, str):
-                    repaired[field] = str(value)
-                elif field_type == "boolean" and not isinstance(value, bool):
-                    if isinstance(value, str):
-                        repaired[field] = value.lower() in ("true", "yes", "1")
-                    else:
-                        repaired[field] = bool(value)
+                repaired[field] = convert(repaired[field])
 
         return repaired
 
@@ -231,42 +364,39 @@ class JSONValidator:
         repaired = data.copy()
 
         # Get field information from the model
-        model_fields = model_class.__fields__
+        field_table = _model_field_table(model_class)
 
         for error_detail in error.errors():
-            field_name = error_detail.get("loc", [""])[0]
+            field_name = error_detail.get("loc", ("",))[0]
             error_type = error_detail.get("type")
 
-            if field_name in model_fields:
-                field_info = model_fields[field_name]
-                field_type = field_info.type_
-
-                if error_type == "value_error.missing":
-                    # Add missing field with default
-                    if hasattr(field_info, "default") and field_info.default is not None:
-                        repaired[field_name] = field_info.default
-                    elif field_type == list:
-                        repaired[field_name] = []
-                    elif field_type == str:
-                        repaired[field_name] = f"Auto-generated {field_name}"
-                    elif field_type == bool:
-                        repaired[field_name] = True
-
-                elif error_type in ["type_error.str", "type_error.integer", "type_error.boolean"]:
-                    # Fix type conversion
-                    if field_type == str:
-                        repaired[field_name] = str(repaired.get(field_name, ""))
-                    elif field_type == int:
-                        try:
-                            repaired[field_name] = int(repaired.get(field_name, 0))
-                        except (ValueError, TypeError):
-                            repaired[field_name] = 0
-                    elif field_type == bool:
-                        value = repaired.get(field_name, False)
-                        if isinstance(value, str):
-                            repaired[field_name] = value.lower() in ("true", "yes", "1")
-                        else:
-                            repaired[field_name] = bool(value)
+            field = field_table.get(field_name)
+            if field is None:
+                continue
+            field_type, default = field
+
+            if error_type in _MISSING_ERRORS:
+                # Add missing field with default
+                if default is not None:
+                    repaired[field_name] = default
+                elif field_type is list:
+                    repaired[field_name] = []
+                elif field_type is str:
+                    repaired[field_name] = f"Auto-generated {field_name}"
+                elif field_type is bool:
+                    repaired[field_name] = True
+
+            elif error_type in _TYPE_ERRORS:
+                # Fix type conversion
+                if field_type is str:
+                    repaired[field_name] = str(repaired.get(field_name, ""))
+                elif field_type is int:
+                    try:
+                        repaired[field_name] = int(repaired.get(field_name, 0))
+                    except (ValueError, TypeError):
+                        repaired[field_name] = 0
+                elif field_type is bool:
+                    repaired[field_name] = _to_bool(repaired.get(field_name, False))
 
         return repaired
 
@@ -274,15 +404,6 @@ class JSONValidator:
 class DiffValidator:
     """Validate and repair unified diff patches."""
 
-    def __init__(self):
-        self.diff_patterns = {
-            "file_header": re.compile(r"^(---|\+\+\+)\s+(.+)"),
-            "hunk_header": re.compile(r"^@@\s+-(\d+)(?:,(\d+))?\s+\+(\d+)(?:,(\d+))?\s+@@"),
-            "context_line": re.compile(r"^(\s)(.+)"),
-            "addition": re.compile(r"^(\+)(.+)"),
-            "deletion": re.compile(r"^(-)(.+)"),
-        }
-
     def validate_and_repair_diff(self, diff_text: str) -> str:
         """
         Validate and repair unified diff format.
@@ -320,19 +441,23 @@ class DiffValidator:
         has_file_headers = False
         has_hunk_headers = False
 
+        # Only header-looking lines reach the regexes; stop as soon as both kinds are seen
         for line in lines:
-            if self.diff_patterns["file_header"].match(line):
-                has_file_headers = True
-            elif self.diff_patterns["hunk_header"].match(line):
-                has_hunk_headers = True
-
-        return has_file_headers and has_hunk_headers
+            if line.startswith(("---", "+++")):
+                if _DIFF_FILE_HEADER_RE.match(line):
+                    has_file_headers = True
+            elif line.startswith("@@"):
+                if _DIFF_HUNK_HEADER_RE.match(line):
+                    has_hunk_headers = True
+            else:
+                continue
+            if has_file_headers and has_hunk_headers:
+                return True
+
+        return False
 
     def _repair_diff(self, diff_text: str) -> str:
         """Attempt to repair malformed diff."""
-        lines = diff_text.strip().split("\n")
-        repaired_lines = []
-
         # Look for file paths in the text
         file_paths = self._extract_file_paths(diff_text)
 
@@ -341,6 +466,8 @@ class DiffValidator:
             return self._create_basic_diff(diff_text)
 
         # Try to reconstruct the diff with proper headers
+        lines = diff_text.strip().split("\n")
+        repaired_lines = []
         current_file = file_paths[0]
         repaired_lines.append(f"--- a/{current_file}")
         repaired_lines.append(f"+++ b/{current_file}")
@@ -348,8 +475,9 @@ class DiffValidator:
 
         # Add the content lines
         for line in lines:
-            if line.strip() and not line.startswith(("---", "+++", "@@")):
-                if line.startswith("+") or line.startswith("-"):
+            # isspace() answers "blank?" without allocating a stripped copy of every line
+            if line and not line.isspace() and not line.startswith(_DIFF_HEADER_PREFIXES):
+                if line.startswith(("+", "-")):
                     repaired_lines.append(line)
                 else:
                     repaired_lines.append(f" {line}")
@@ -358,20 +486,8 @@ class DiffValidator:
 
     def _extract_file_paths(self, text: str) -> List[str]:
         """Extract potential file paths from text."""
-        # Look for common file patterns
-        patterns = [
-            r"(\w+\.\w+)",  # filename.extension
-            r"([a-zA-Z0-9_/]+\.py)",  # Python files
-            r"([a-zA-Z0-9_/]+\.js)",  # JavaScript files
-            r"([a-zA-Z0-9_/]+\.ts)",  # TypeScript files
-        ]
-
-        file_paths = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            file_paths.extend(matches)
-
-        return list(set(file_paths))  # Remove duplicates
+        # Deduplicate while keeping first-mention order; _repair_diff targets the first path
+        return list(dict.fromkeys(_FILE_PATH_RE.findall(text)))
 
     def _create_basic_diff(self, content: str) -> str:
         """Create a basic diff structure when file paths can't be determined."""
@@ -395,7 +511,7 @@ class DiffValidator:
 
         # Add content lines
         for line in lines:
-            if line.strip():
+            if line and not line.isspace():
                 if not line.startswith(("+", "-", " ")):
                     # Add context marker if missing
                     diff_lines.append(f" {line}")
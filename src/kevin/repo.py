@@ -1,16 +1,22 @@
 from __future__ import annotations
 
+import copy
+import os
 import re
 import subprocess
+from functools import lru_cache
 from pathlib import Path
 
+_GIT_URL_PREFIXES = ("https://", "http://", "git@", "ssh://")
+_SLUG_RE = re.compile(r"[^\w.-]+")
+
 
 def _is_git_url(s: str) -> bool:
-    return bool(re.match(r"^(?:https?://|git@|ssh://)", s))
+    return s.startswith(_GIT_URL_PREFIXES)
 
 
 def _slugify(url: str) -> str:
-    s = re.sub(r"[^\w.-]+", "-", url.strip().lower())
+    s = _SLUG_RE.sub("-", url.strip().lower())
     return s.strip("-")[:80] or "repo"
 
 
@@ -19,6 +25,17 @@ def prepare_repo(repo_input: str) -> Path:
     If `repo_input` is a local path, return its absolute Path.
     If it's a git URL, clone shallow into ./.kevin/workspaces/<slug>/ (create if missing).
     """
+    # Relative inputs and the workspace dir resolve against the cwd, so it is part of the key
+    cwd = os.getcwd()
+    path = _prepare_repo_cached(repo_input, cwd)
+    if not path.exists():  # removed since it was cached
+        _prepare_repo_cached.cache_clear()
+        path = _prepare_repo_cached(repo_input, cwd)
+    return path
+
+
+@lru_cache(maxsize=64)
+def _prepare_repo_cached(repo_input: str, cwd: str) -> Path:
     p = Path(repo_input)
     if p.exists():
         return p.resolve()
@@ -44,20 +61,52 @@ def prepare_repo(repo_input: str) -> Path:
     return dest
 
 
+def _workspace_key(repo_path: Path) -> tuple[str, int]:
+    """
+    Cache key for detection results: the workspace path plus its mtime, which changes
+    whenever a top-level entry is added, removed or renamed.
+    """
+    return str(repo_path), repo_path.stat().st_mtime_ns
+
+
+def _file_contains(path: Path, needle: bytes, chunk_size: int = 65536) -> bool:
+    """
+    Whether the file's raw bytes contain `needle`, reading fixed-size chunks and stopping
+    at the first hit, so large files are neither read whole nor decoded.
+    """
+    overlap = len(needle) - 1
+    with path.open("rb") as f:
+        tail = b""
+        while chunk := f.read(chunk_size):
+            window = tail + chunk
+            if needle in window:
+                return True
+            tail = window[-overlap:] if overlap else b""
+    return False
+
+
 def detect_test_command(repo_path: Path) -> str | None:
     """
     Heuristics to guess a test command. Keep simple for now.
     Always use uv for Python projects.
     """
-    if (repo_path / "tests").exists():
+    return _detect_test_command_cached(*_workspace_key(repo_path))
+
+
+@lru_cache(maxsize=32)
+def _detect_test_command_cached(repo_dir: str, mtime_ns: int) -> str | None:
+    # One directory read answers every "does X exist" question below
+    names = _scan_dir(repo_dir)
+    if "tests" in names:
         return "uv run pytest -q"
-    if (repo_path / "pytest.ini").exists():
+    if "pytest.ini" in names:
         return "uv run pytest -q"
-    pyproject = repo_path / "pyproject.toml"
-    if pyproject.exists() and "pytest" in pyproject.read_text(encoding="utf-8", errors="ignore"):
+    pyproject = Path(repo_dir, "pyproject.toml")
+    if "pyproject.toml" in names and _file_contains(pyproject, b"pytest"):
         return "uv run pytest -q"
-    package_json = repo_path / "package.json"
-    if package_json.exists():
+    package_json = Path(repo_dir, "package.json")
+    # A "test" script needs the literal "test" key, so skip parsing files that can't have one
+    if "package.json" in names and _file_contains(package_json, b'"test"'):
         try:
             import json
 
@@ -74,11 +123,21 @@ def detect_project_info(repo_path: Path) -> dict:
     Detect flexible project information to help the AI understand the layout.
     Returns a dictionary with boolean flags and lists of found items.
     """
+    # Callers get their own copy so mutating it can't corrupt the cached result
+    return copy.deepcopy(_detect_project_info_cached(*_workspace_key(repo_path)))
+
+
+@lru_cache(maxsize=32)
+def _detect_project_info_cached(repo_dir: str, mtime_ns: int) -> dict:
+    # One scandir per directory; DirEntry.is_dir()/is_file() reuse what readdir returned
+    root = _scan_dir(repo_dir)
+    src = root.get("src")
+    tests = root.get("tests")
     info = {
-        "has_src_layout": (repo_path / "src").exists(),
-        "has_tests_dir": (repo_path / "tests").exists(),
-        "has_pyproject": (repo_path / "pyproject.toml").exists(),
-        "has_setup_py": (repo_path / "setup.py").exists(),
+        "has_src_layout": src is not None and src.is_dir(),
+        "has_tests_dir": tests is not None and tests.is_dir(),
+        "has_pyproject": "pyproject.toml" in root,
+        "has_setup_py": "setup.py" in root,
         "package_dirs": [],
         "test_files": [],
     }
@@ -86,30 +145,38 @@ def detect_project_info(repo_path: Path) -> dict:
     # Find package directories
     if info["has_src_layout"]:
         # Look for packages in src/
-        src_dir = repo_path / "src"
-        for item in src_dir.iterdir():
-            if item.is_dir() and (item / "__init__.py").exists():
-                info["package_dirs"].append(f"src/{item.name}")
+        for entry in _scan_dir(src.path).values():
+            if _is_package(entry):
+                info["package_dirs"].append(f"src/{entry.name}")
     else:
         # Look for packages in root
-        for item in repo_path.iterdir():
-            if (
-                item.is_dir()
-                and (item / "__init__.py").exists()
-                and item.name not in ["tests", "__pycache__", ".git"]
-            ):
-                info["package_dirs"].append(item.name)
+        for entry in root.values():
+            if _is_package(entry) and entry.name not in ("tests", "__pycache__", ".git"):
+                info["package_dirs"].append(entry.name)
 
     # Find test files
     if info["has_tests_dir"]:
-        tests_dir = repo_path / "tests"
-        for item in tests_dir.iterdir():
-            if item.is_file() and item.suffix == ".py" and item.name.startswith("test_"):
-                info["test_files"].append(f"tests/{item.name}")
+        for entry in _scan_dir(tests.path).values():
+            if _is_test_file(entry):
+                info["test_files"].append(f"tests/{entry.name}")
     else:
         # Look for test files in root
-        for item in repo_path.iterdir():
-            if item.is_file() and item.suffix == ".py" and item.name.startswith("test_"):
-                info["test_files"].append(item.name)
+        for entry in root.values():
+            if _is_test_file(entry):
+                info["test_files"].append(entry.name)
 
     return info
+
+
+def _scan_dir(path: str) -> dict[str, os.DirEntry]:
+    """Directory entries by name, in listing order."""
+    with os.scandir(path) as it:
+        return {entry.name: entry for entry in it}
+
+
+def _is_package(entry: os.DirEntry) -> bool:
+    return entry.is_dir() and os.path.exists(os.path.join(entry.path, "__init__.py"))
+
+
+def _is_test_file(entry: os.DirEntry) -> bool:
+    return entry.name.startswith("test_") and entry.name.endswith(".py") and entry.is_file()
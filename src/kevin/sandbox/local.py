@@ -1,15 +1,264 @@
 from __future__ import annotations
 
 import os
+import re
+import selectors
+import shlex
+import signal
+import stat
 import subprocess
-import tempfile
+import threading
 import time
+import uuid
 from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from pathlib import Path
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+
+# Upper bound on threads writing independent file edits
+_EDIT_WORKERS = 8
+
+# Characters with shell meaning (expansion, redirection, quoting escapes, comments)
+_SHELL_META = frozenset("|&;<>()$`\\*?[]{}~#\n")
+# Builtins that have no executable of their own
+_SHELL_BUILTINS = frozenset(
+    ". alias cd command eval exec exit export set source type ulimit umask unset".split()
+)
+
+# Markdown code fence, possibly indented; matched in place instead of lstrip()-ing each line
+_FENCE_RE = re.compile(r"\s*```")
+# Lines that look like diff content; "---"/"+++" are covered by the "-"/"+" alternatives
+_DIFF_LINE_RE = re.compile(r"diff|@@|[-+ ]")
+# Blank lines and obvious prose ("Here is the patch", "This fixes...") around a diff
+_PROSE_RE = re.compile(r"\s*(?:$|Here|This|The|I|We)")
+# Markers that make a diff recognizable as unified or git-style
+_GIT_DIFF_RE = re.compile(r"^diff --git", re.MULTILINE)
+_MINUS_HEADER_RE = re.compile(r"^---", re.MULTILINE)
+_PLUS_HEADER_RE = re.compile(r"^\+\+\+", re.MULTILINE)
+# Unified diff file headers, normalized to git's a/ and b/ prefixes
+_DIFF_HEADER_RE = re.compile(r"^(---|\+\+\+) (.*)$", re.MULTILINE)
+_HUNK_HEADER_RE = re.compile(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_NO_NEWLINE_MARKER = "\\ No newline at end of file"
+# git extended header lines that don't change how a new or whole-file hunk applies.
+# Any other mode, delete, rename or copy header sends the diff to git.
+_PASSTHROUGH_PREFIXES = ("diff --git ", "index ")
+_NEW_FILE_MODE = "new file mode "
+# Regular new-file modes the direct path can reproduce, mapped to "is executable"
+_NEW_FILE_MODES = {"100644": False, "100755": True}
+
+
+def _is_valid_diff_format(diff: str) -> bool:
+    """Check if diff has valid format markers."""
+    # Each search stops at its first hit instead of walking every line in Python
+    if _GIT_DIFF_RE.search(diff):
+        return True
+    return bool(_MINUS_HEADER_RE.search(diff) and _PLUS_HEADER_RE.search(diff))
+
+
+def _normalize_diff_header(match: re.Match[str]) -> str:
+    """Give a ---/+++ header the a/ or b/ prefix git apply expects."""
+    sign, path = match.groups()
+    prefix = "a/" if sign == "---" else "b/"
+    if path.startswith(prefix):
+        return match.group(0)
+    return f"{sign} {prefix}{path.strip()}"
+
+
+def _split_without_shell(cmd: str) -> list[str] | None:
+    """Return argv for `cmd` when running it needs no shell features, else None."""
+    if not _SHELL_META.isdisjoint(cmd):
+        return None
+    try:
+        argv = shlex.split(cmd)
+    except ValueError:
+        return None
+    # "VAR=value prog" assignments and builtins only work inside a shell
+    if not argv or "=" in argv[0] or argv[0] in _SHELL_BUILTINS:
+        return None
+    return argv
+
+
+def _decode_output(data: bytes) -> str:
+    """
+    Decode captured process output once, tolerating invalid UTF-8.
+    Line endings are normalized the way text-mode pipes would.
+    """
+    text = data.decode("utf-8", errors="replace")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
 
+def _header_path(line: str, prefix: str) -> str:
+    """Path named by a normalized ---/+++ header, without its a/ or b/ prefix."""
+    path = line[4:].split("\t", 1)[0]
+    return path[len(prefix) :] if path.startswith(prefix) else path
 
-@dataclass
+
+def _parse_whole_file_hunks(diff: str) -> list[tuple[str, str | None, str, bool]] | None:
+    """
+    Parse a diff in which every file is a single hunk starting at line 1.
+    Returns (path, old_text, new_text, executable) per file, with old_text None for
+    new files, or None when any part of the diff needs git's real apply logic.
+    """
+    lines = diff.split("\n")
+    files: list[tuple[str, str | None, str, bool]] = []
+    seen: set[str] = set()
+    new_file_mode: str | None = None
+    i = 0
+    while i < len(lines):
+        if lines[i].startswith(_PASSTHROUGH_PREFIXES):
+            i += 1
+            continue
+        if lines[i].startswith(_NEW_FILE_MODE):
+            new_file_mode = lines[i][len(_NEW_FILE_MODE) :]
+            if new_file_mode not in _NEW_FILE_MODES:
+                return None
+            i += 1
+            continue
+        if i + 2 >= len(lines) or not (
+            lines[i].startswith("--- ") and lines[i + 1].startswith("+++ ")
+        ):
+            return None
+        old_path = _header_path(lines[i], "a/")
+        path = _header_path(lines[i + 1], "b/")
+        match = _HUNK_HEADER_RE.match(lines[i + 2])
+        if match is None:
+            return None
+        old_start, old_count, new_start, new_count = (
+            1 if group is None else int(group) for group in match.groups()
+        )
+        if old_start > 1 or new_start > 1:
+            return None
+        i += 3
+
+        old: list[str] = []
+        new: list[str] = []
+        old_eol = new_eol = True
+        tag = ""
+        while (
+            len(old) < old_count
+            or len(new) < new_count
+            or (i < len(lines) and lines[i] == _NO_NEWLINE_MARKER)
+        ):
+            if i >= len(lines):
+                return None
+            line = lines[i]
+            i += 1
+            if line == _NO_NEWLINE_MARKER:
+                # Applies to the line just before it
+                old_eol = old_eol and tag == "+"
+                new_eol = new_eol and tag == "-"
+                continue
+            tag, text = line[:1], line[1:]
+            if tag == " ":
+                old.append(text)
+                new.append(text)
+            elif tag == "-":
+                old.append(text)
+            elif tag == "+":
+                # git apply --whitespace=fix would rewrite these, so leave them to git
+                if text != text.rstrip() or " \t" in text:
+                    return None
+                new.append(text)
+            else:
+                return None
+        if len(old) != old_count or len(new) != new_count:
+            return None
+        if tag == "+" and new and not new[-1]:
+            return None  # blank lines added at EOF are also a whitespace fix
+
+        is_new_file = old_path == "/dev/null"
+        parts = PurePosixPath(path).parts
+        if (
+            (not is_new_file and (old_path != path or new_file_mode is not None))
+            or (is_new_file and old_count)
+            or not parts
+            or path.startswith("/")
+            or ".." in parts
+            or path in seen
+        ):
+            return None
+        seen.add(path)
+        new_text = "\n".join(new) + ("\n" if new and new_eol else "")
+        old_text = "\n".join(old) + ("\n" if old and old_eol else "")
+        executable = new_file_mode is not None and _NEW_FILE_MODES[new_file_mode]
+        files.append((path, None if is_new_file else old_text, new_text, executable))
+        new_file_mode = None
+    return files or None
+
+
+def _crosses_symlink(root: Path, path: str) -> bool:
+    """Whether path, or any directory leading to it below root, is a symlink."""
+    current = root
+    for part in PurePosixPath(path).parts:
+        current = current / part
+        if current.is_symlink():
+            return True
+    return False
+
+
+def _atomic_write_bytes(path: Path, data: bytes) -> None:
+    """
+    Write data to a sibling temp file and rename it over path, so readers never
+    see a half-written file. Existing permissions and symlinks are preserved.
+    """
+    try:
+        st = path.lstat()
+    except FileNotFoundError:
+        mode = None
+    else:
+        if stat.S_ISLNK(st.st_mode):
+            # Replace the link's target, not the link itself
+            path = path.resolve()
+            st = path.stat()
+        mode = stat.S_IMODE(st.st_mode)
+
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:12]}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if mode is not None:
+                os.fchmod(f.fileno(), mode)
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _no_clock() -> float:
+    return 0.0
+
+
+@lru_cache(maxsize=128)
+def _prepare_diff(unified_diff: str) -> str | None:
+    """
+    Strip, validate and normalize a raw diff, or return None if it isn't one.
+    Cached because retry loops resubmit the same diff after a failed apply.
+    """
+    # One pass drops code fences and prose and undoes CRLF line endings
+    kept_lines = []
+    in_code_block = False
+    for line in unified_diff.split("\n"):
+        if _FENCE_RE.match(line):
+            in_code_block = not in_code_block
+            continue
+        if in_code_block:
+            continue
+        # Skip prose lines that don't look like diff content
+        if not _DIFF_LINE_RE.match(line) and _PROSE_RE.match(line):
+            continue
+        kept_lines.append(line[:-1] if line.endswith("\r") else line)
+
+    diff = "\n".join(kept_lines).strip()
+    if not _is_valid_diff_format(diff):
+        return None
+    return _DIFF_HEADER_RE.sub(_normalize_diff_header, diff)
+
+
+@dataclass(slots=True)
 class CmdResult:
     returncode: int
     stdout: str
@@ -17,43 +266,177 @@ class CmdResult:
     duration_s: float
 
 
+class _PersistentShell:
+    """
+    A long-lived /bin/sh that runs one command at a time. Each command gets its own
+    subshell (so cd/exports don't leak) and its output ends at a per-command marker.
+    """
+
+    def __init__(self, cwd: str) -> None:
+        self._proc = subprocess.Popen(
+            ["/bin/sh"],
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+            start_new_session=True,
+        )
+
+    def alive(self) -> bool:
+        return self._proc.poll() is None
+
+    def close(self) -> None:
+        if self.alive():
+            try:
+                # The shell leads its own session, so this also stops the running command
+                os.killpg(self._proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self._proc.wait()
+        for pipe in (self._proc.stdin, self._proc.stdout, self._proc.stderr):
+            pipe.close()
+
+    def run(self, cmd: str, timeout: float) -> subprocess.CompletedProcess[bytes]:
+        marker = f"__kevin_done_{uuid.uuid4().hex}__"
+        # eval keeps a malformed command (e.g. an unclosed quote) from swallowing the markers
+        script = (
+            f"(eval {shlex.quote(cmd)}) </dev/null\n"
+            f"printf '%s %d\\n' {marker} $?\n"
+            f"printf '%s\\n' {marker} >&2\n"
+        )
+        self._proc.stdin.write(script.encode("utf-8"))
+
+        marker_bytes = marker.encode()
+        out = bytearray()
+        err = bytearray()
+        # Where each stream's marker starts, keyed by the stream's fd
+        marker_at: dict[int, int] = {}
+        deadline = time.monotonic() + timeout
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._proc.stdout, selectors.EVENT_READ, out)
+            selector.register(self._proc.stderr, selectors.EVENT_READ, err)
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.close()
+                    raise subprocess.TimeoutExpired(cmd, timeout, bytes(out), bytes(err))
+                for key, _ in selector.select(remaining):
+                    buf = key.data
+                    chunk = os.read(key.fd, 65536)
+                    if not chunk:
+                        # The shell itself went away; report whatever it left behind
+                        self._proc.wait()
+                        return subprocess.CompletedProcess(
+                            cmd, self._proc.returncode, bytes(out), bytes(err)
+                        )
+                    buf.extend(chunk)
+                    # Only the newly read tail (plus a marker line split across reads)
+                    # can contain the marker
+                    start = len(buf) - len(chunk) - len(marker_bytes) - 8
+                    at = buf.find(marker_bytes, max(0, start))
+                    if at >= 0 and buf.endswith(b"\n"):
+                        marker_at[key.fd] = at
+                        selector.unregister(key.fileobj)
+
+        out_end = marker_at[self._proc.stdout.fileno()]
+        err_end = marker_at[self._proc.stderr.fileno()]
+        returncode = int(out[out_end + len(marker_bytes) :])
+        return subprocess.CompletedProcess(
+            cmd, returncode, bytes(out[:out_end]), bytes(err[:err_end])
+        )
+
+
 class LocalSandbox:
     """
     Minimal sandbox that runs commands in a working directory on the host.
     Future: add DockerSandbox with same interface.
     """
 
-    def __init__(self, workdir: str | Path) -> None:
-        self.workdir = str(Path(workdir).resolve())
+    def __init__(
+        self, workdir: str | Path, collect_timing: bool = True, persistent_shell: bool = False
+    ) -> None:
+        # Keep the resolved Path around so file helpers don't re-parse the string
+        self._workdir_path = Path(workdir).resolve()
+        self.workdir = str(self._workdir_path)
+        # With timing off every duration_s is 0.0 and no clock reads are made
+        self.collect_timing = collect_timing
+        self._clock = time.perf_counter if collect_timing else _no_clock
+        # Optionally reuse one shell for string commands instead of spawning one per call
+        self.persistent_shell = persistent_shell
+        self._shell: _PersistentShell | None = None
+        self._shell_lock = threading.Lock()
 
     def exec(self, cmd: str | Sequence[str], timeout: int = 120) -> CmdResult:
-        start = time.perf_counter()
-        proc = subprocess.run(
+        start = self._clock()
+        proc = None
+        if isinstance(cmd, str):
+            if self.persistent_shell:
+                proc = self._run_persistent(cmd, timeout)
+            if proc is None:
+                proc = self._run_string(cmd, timeout)
+        else:
+            proc = self._run(cmd, shell=False, timeout=timeout)
+        return CmdResult(
+            returncode=proc.returncode,
+            stdout=_decode_output(proc.stdout),
+            stderr=_decode_output(proc.stderr),
+            duration_s=self._clock() - start,
+        )
+
+    def close(self) -> None:
+        """Stop the persistent shell, if one was started."""
+        with self._shell_lock:
+            if self._shell is not None:
+                self._shell.close()
+                self._shell = None
+
+    def _run_persistent(self, cmd: str, timeout: int) -> subprocess.CompletedProcess[bytes] | None:
+        """Run cmd in the long-lived shell, or return None if another thread is using it."""
+        if not self._shell_lock.acquire(blocking=False):
+            return None
+        try:
+            if self._shell is None or not self._shell.alive():
+                self._shell = _PersistentShell(self.workdir)
+            return self._shell.run(cmd, timeout)
+        finally:
+            self._shell_lock.release()
+
+    def _run_string(self, cmd: str, timeout: int) -> subprocess.CompletedProcess[bytes]:
+        # Plain "prog arg ..." strings skip the extra /bin/sh process
+        argv = _split_without_shell(cmd)
+        if argv is not None:
+            try:
+                return self._run(argv, shell=False, timeout=timeout)
+            except OSError:
+                # Let the shell produce its usual "not found" (127) result
+                pass
+        return self._run(cmd, shell=True, timeout=timeout)
+
+    def _run(
+        self, cmd: str | Sequence[str], shell: bool, timeout: int
+    ) -> subprocess.CompletedProcess[bytes]:
+        return subprocess.run(
             cmd,
             cwd=self.workdir,
-            shell=isinstance(cmd, str),
+            shell=shell,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True,
             timeout=timeout,
             check=False,
         )
-        return CmdResult(
-            returncode=proc.returncode,
-            stdout=proc.stdout,
-            stderr=proc.stderr,
-            duration_s=time.perf_counter() - start,
-        )
 
     def read_file(self, path: str, max_bytes: int = 100_000) -> str:
-        p = Path(self.workdir) / path
-        data = p.read_bytes()
-        return data[:max_bytes].decode("utf-8", errors="replace")
+        p = self._workdir_path / path
+        # Only pull in the bytes we return, however large the file is
+        with p.open("rb") as f:
+            data = f.read(max_bytes)
+        return data.decode("utf-8", errors="replace")
 
     def write_file(self, path: str, content: str) -> None:
-        p = Path(self.workdir) / path
+        p = self._workdir_path / path
         p.parent.mkdir(parents=True, exist_ok=True)
-        p.write_text(content, encoding="utf-8")
+        _atomic_write_bytes(p, content.encode("utf-8"))
 
     def apply_patch(self, unified_diff: str) -> CmdResult:
         """Apply a patch with multiple fallback strategies for robustness."""
@@ -61,12 +444,9 @@ class LocalSandbox:
         diff_preview = unified_diff[:1000] + "..." if len(unified_diff) > 1000 else unified_diff
         first_20_lines = "\n".join(unified_diff.split("\n")[:20])
 
-        # Step 2: Strip wrappers and normalize
-        diff = self._strip_diff_wrappers(unified_diff)
-        diff = diff.replace("\r\n", "\n").strip()
-
-        # Step 3: Validate diff format
-        if not self._is_valid_diff_format(diff):
+        # Steps 2-4: Strip wrappers, validate the format and normalize paths
+        diff = _prepare_diff(unified_diff)
+        if diff is None:
             return CmdResult(
                 returncode=1,
                 stdout="",
@@ -74,211 +454,185 @@ class LocalSandbox:
                 duration_s=0.0,
             )
 
-        # Step 4: Normalize paths and check files
-        diff = self._normalize_diff_paths(diff)
-
-        # Step 5: Try multiple apply strategies
-        strategies = [
-            # Preflight check
-            ["git", "apply", "--check"],
-            # Standard apply with whitespace fixes
-            ["git", "apply", "--whitespace=fix", "--ignore-whitespace"],
-            # Try with -p0 (no prefix stripping)
-            ["git", "apply", "-p0", "--whitespace=fix", "--ignore-whitespace"],
-            # Try with -p1 (strip one directory level)
-            ["git", "apply", "-p1", "--whitespace=fix", "--ignore-whitespace"],
-            # Try with -p2 (strip two directory levels)
-            ["git", "apply", "-p2", "--whitespace=fix", "--ignore-whitespace"],
-        ]
+        # New files and whole-file rewrites can be written without spawning git
+        direct = self._try_direct_apply(diff)
+        if direct is not None:
+            return direct
+
+        # Every strategy is fed the same encoded diff on stdin; no temp file needed
+        diff_bytes = diff.encode("utf-8")
+
+        # Step 5: Preflight with --check and only run a real apply once one passes
+        apply_opts = ["--whitespace=fix", "--ignore-whitespace"]
+        git_error = ""
+        for prefix in ([], ["-p0"], ["-p1"], ["-p2"]):
+            check = self._try_apply_strategy(
+                ["git", "apply", "--check", *prefix, *apply_opts], diff_bytes
+            )
+            if check.returncode == 0:
+                return self._try_apply_strategy(["git", "apply", *prefix, *apply_opts], diff_bytes)
+            # The unprefixed attempt usually says the most about why the diff is bad
+            git_error = git_error or check.stderr
 
         # Only try 3-way merge if we have git-style diff with index lines
         if "diff --git" in diff and "index " in diff:
-            strategies.append(["git", "apply", "-3"])
-
-        last_error = ""
-        for strategy in strategies:
-            result = self._try_apply_strategy(strategy, diff)
-            if result.returncode == 0 and "apply" in " ".join(strategy):
+            result = self._try_apply_strategy(["git", "apply", "-3"], diff_bytes)
+            if result.returncode == 0:
                 return result
-            last_error = result.stderr
 
         # Step 6: Fallback to patch utility with different prefix levels
         patch_strategies = ["-p0", "-p1", "-p2"]
         for prefix in patch_strategies:
-            patch_result = self._try_patch_fallback(diff, prefix)
+            patch_result = self._try_patch_fallback(diff_bytes, prefix)
             if patch_result.returncode == 0:
                 return patch_result
 
         # Step 7: Return detailed error with all context
         error_msg = f"All patch strategies failed.\n"
-        error_msg += f"Last git error: {last_error}\n"
+        error_msg += f"Git error: {git_error}\n"
         error_msg += f"Patch utility error: {patch_result.stderr}\n"
         error_msg += f"Diff preview (first 20 lines):\n{first_20_lines}"
 
         return CmdResult(returncode=1, stdout="", stderr=error_msg, duration_s=0.0)
 
-    def _strip_diff_wrappers(self, diff: str) -> str:
-        """Remove code fences, markdown, and prose from diff."""
-        # Remove triple backticks and language specifiers
-        lines = diff.split("\n")
-        stripped_lines = []
-        in_code_block = False
-
-        for line in lines:
-            # Skip markdown code fences
-            if line.strip().startswith("```"):
-                in_code_block = not in_code_block
-                continue
-            if in_code_block:
-                continue
-
-            # Skip prose lines that don't look like diff content
-            if not any(
-                line.startswith(prefix) for prefix in ["---", "+++", "diff", "@@", "+", "-", " "]
-            ):
-                # Skip lines that are clearly prose
-                if not line.strip() or line.strip().startswith(("Here", "This", "The", "I", "We")):
-                    continue
-
-            stripped_lines.append(line)
-
-        return "\n".join(stripped_lines)
-
-    def _is_valid_diff_format(self, diff: str) -> bool:
-        """Check if diff has valid format markers."""
-        lines = diff.split("\n")
-        has_unified = any(line.startswith("---") for line in lines) and any(
-            line.startswith("+++") for line in lines
-        )
-        has_git_style = any(line.startswith("diff --git") for line in lines)
-        return has_unified or has_git_style
-
-    def _normalize_diff_paths(self, diff: str) -> str:
-        """Normalize paths in diff to be repo-relative."""
-        lines = diff.split("\n")
-        normalized_lines = []
-
-        for line in lines:
-            # Handle unified diff headers
-            if line.startswith("--- a/") or line.startswith("+++ b/"):
-                # Keep a/ and b/ prefixes for git apply -p0
-                normalized_lines.append(line)
-            elif line.startswith("--- ") or line.startswith("+++ "):
-                # Convert to git-style with a/ and b/ prefixes
-                prefix = line[:4]
-                path = line[4:].strip()
-                if prefix == "--- ":
-                    normalized_lines.append(f"--- a/{path}")
-                else:
-                    normalized_lines.append(f"+++ b/{path}")
+    def _try_direct_apply(self, diff: str) -> CmdResult | None:
+        """
+        Apply new-file and whole-file hunks by writing the result directly.
+        Returns None (leaving the diff to git) unless every file on disk matches
+        its hunk's old side exactly.
+        """
+        parsed = _parse_whole_file_hunks(diff)
+        if parsed is None:
+            return None
+
+        root = self._workdir_path.resolve()
+        edits = []
+        executables = []
+        for path, old_text, new_text, executable in parsed:
+            file_path = self._workdir_path / path
+            # git apply refuses to write through symlinks; leave those diffs to it
+            if _crosses_symlink(self._workdir_path, path):
+                return None
+            if not file_path.resolve().is_relative_to(root):
+                return None
+            if old_text is None:
+                if file_path.exists():
+                    return None
+                mode = "create"
+                if executable:
+                    executables.append(file_path)
             else:
-                normalized_lines.append(line)
+                try:
+                    current = file_path.read_bytes().decode("utf-8")
+                except (OSError, UnicodeDecodeError):
+                    return None
+                if current != old_text:
+                    return None
+                mode = "replace"
+            edits.append({"path": path, "mode": mode, "content": new_text})
+        result = self.apply_file_edits(edits)
+        if result.returncode == 0:
+            for file_path in executables:
+                # Like git: executable wherever the umask left the file readable
+                file_mode = file_path.stat().st_mode
+                file_path.chmod(file_mode | (file_mode & 0o444) >> 2)
+        return result
+
+    def _try_apply_strategy(self, strategy: list[str], diff_bytes: bytes) -> CmdResult:
+        """Try a specific git apply strategy, piping the diff in on stdin."""
+        # Use subprocess directly for better control
+        start_time = self._clock()
+        cmd = strategy + ["-"]
+        proc = subprocess.run(
+            cmd,
+            cwd=self.workdir,
+            input=diff_bytes,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=60,
+            check=False,
+        )
+        duration = self._clock() - start_time
 
-        return "\n".join(normalized_lines)
+        return CmdResult(
+            returncode=proc.returncode,
+            stdout=_decode_output(proc.stdout),
+            stderr=_decode_output(proc.stderr),
+            duration_s=duration,
+        )
 
-    def _try_apply_strategy(self, strategy: list[str], diff: str) -> CmdResult:
-        """Try a specific git apply strategy."""
-        with tempfile.NamedTemporaryFile("w", delete=False, encoding="utf-8") as tf:
-            tf.write(diff)
-            tf.flush()
-            path = tf.name
+    def _try_patch_fallback(self, diff_bytes: bytes, prefix: str = "-p0") -> CmdResult:
+        """Try patch utility as fallback with specified prefix level."""
+        start_time = self._clock()
+        proc = subprocess.run(
+            ["patch", "--batch", prefix],
+            cwd=self.workdir,
+            input=diff_bytes,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=60,
+            check=False,
+        )
+        duration = self._clock() - start_time
 
-        try:
-            # Use subprocess directly for better control
-            start_time = time.perf_counter()
-            cmd = strategy + [path]
-            proc = subprocess.run(
-                cmd,
-                cwd=self.workdir,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=60,
-                check=False,
-            )
-            duration = time.perf_counter() - start_time
+        return CmdResult(
+            returncode=proc.returncode,
+            stdout=_decode_output(proc.stdout),
+            stderr=_decode_output(proc.stderr),
+            duration_s=duration,
+        )
 
-            return CmdResult(
-                returncode=proc.returncode,
-                stdout=proc.stdout,
-                stderr=proc.stderr,
-                duration_s=duration,
-            )
-        finally:
-            try:
-                os.unlink(path)
-            except OSError:
-                pass
+    def _apply_file_edit(self, edit: dict, made_dirs: set[Path]) -> tuple[bool, str]:
+        """Apply one edit, returning (succeeded, message)."""
+        path = edit["path"]
+        mode = edit["mode"]
+        content = edit.get("content", "")
 
-    def _try_patch_fallback(self, diff: str, prefix: str = "-p0") -> CmdResult:
-        """Try patch utility as fallback with specified prefix level."""
-        with tempfile.NamedTemporaryFile("w", delete=False, encoding="utf-8") as tf:
-            tf.write(diff)
-            tf.flush()
-            path = tf.name
+        file_path = self._workdir_path / path
 
         try:
-            # Use subprocess directly to handle input redirection properly
-            start_time = time.perf_counter()
-            proc = subprocess.run(
-                ["patch", "--batch", prefix],
-                cwd=self.workdir,
-                input=diff,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=60,
-                check=False,
-            )
-            duration = time.perf_counter() - start_time
+            if mode == "replace" or mode == "create":
+                # Ensure parent directory exists
+                parent = file_path.parent
+                if parent not in made_dirs:
+                    parent.mkdir(parents=True, exist_ok=True)
+                    made_dirs.add(parent)
+                _atomic_write_bytes(file_path, content.encode("utf-8"))
+                verb = "replaced" if mode == "replace" else "created"
+                return True, f"{verb} {path}"
+            elif mode == "delete":
+                try:
+                    file_path.unlink()
+                except FileNotFoundError:
+                    return False, f"file {path} does not exist for deletion"
+                return True, f"deleted {path}"
+            else:
+                return False, f"unknown mode '{mode}' for {path}"
 
-            return CmdResult(
-                returncode=proc.returncode,
-                stdout=proc.stdout,
-                stderr=proc.stderr,
-                duration_s=duration,
-            )
-        finally:
-            try:
-                os.unlink(path)
-            except OSError:
-                pass
+        except Exception as e:
+            return False, f"failed to {mode} {path}: {e}"
 
     def apply_file_edits(self, edits: list[dict]) -> CmdResult:
         """Apply file edits directly (robust fallback to patches)."""
         try:
             applied_files = []
             errors = []
+            # Many edits share a directory; only create each parent once
+            made_dirs: set[Path] = set()
 
-            for edit in edits:
-                path = edit["path"]
-                mode = edit["mode"]
-                content = edit.get("content", "")
+            def apply_one(edit: dict) -> tuple[bool, str]:
+                return self._apply_file_edit(edit, made_dirs)
 
-                file_path = Path(self.workdir) / path
+            # Edits to distinct paths don't interact, so run the I/O concurrently;
+            # repeated paths (e.g. replace then delete) must keep their order
+            if len(edits) > 2 and len({edit["path"] for edit in edits}) == len(edits):
+                with ThreadPoolExecutor(max_workers=min(_EDIT_WORKERS, len(edits))) as pool:
+                    results = list(pool.map(apply_one, edits))
+            else:
+                results = [apply_one(edit) for edit in edits]
 
-                try:
-                    if mode == "replace":
-                        # Ensure parent directory exists
-                        file_path.parent.mkdir(parents=True, exist_ok=True)
-                        file_path.write_text(content, encoding="utf-8")
-                        applied_files.append(f"replaced {path}")
-                    elif mode == "create":
-                        # Ensure parent directory exists
-                        file_path.parent.mkdir(parents=True, exist_ok=True)
-                        file_path.write_text(content, encoding="utf-8")
-                        applied_files.append(f"created {path}")
-                    elif mode == "delete":
-                        if file_path.exists():
-                            file_path.unlink()
-                            applied_files.append(f"deleted {path}")
-                        else:
-                            errors.append(f"file {path} does not exist for deletion")
-                    else:
-                        errors.append(f"unknown mode '{mode}' for {path}")
-
-                except Exception as e:
-                    errors.append(f"failed to {mode} {path}: {e}")
+            for ok, message in results:
+                (applied_files if ok else errors).append(message)
 
             if errors:
                 return CmdResult(
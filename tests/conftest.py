@@ -0,0 +1,16 @@
+from __future__ import annotations
+
+from unittest.mock import patch
+
+import pytest
+
+# Imported while conftest loads, so the anthropic SDK and model classes are built before
+# collection instead of inside whichever test first touches the client
+from kevin.models import claude as claude_module
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _patch_anthropic():
+    """Patch the sync Anthropic client once for the whole run so no test reaches the API."""
+    with patch.object(claude_module, "Anthropic") as mock_anthropic:
+        yield mock_anthropic
@@ -1,6 +1,10 @@
+import subprocess
+import sys
+from pathlib import Path
+
 from click.testing import CliRunner
 
-from kevin.cli import cli
+from kevin.cli import cli, response_cache_dir
 
 
 def test_help_and_version() -> None:
@@ -8,3 +12,16 @@ def test_help_and_version() -> None:
     assert r.exit_code == 0
     r = CliRunner().invoke(cli, ["--version"])
     assert r.exit_code == 0
+
+
+def test_cli_import_is_lightweight() -> None:
+    code = "import sys, kevin.cli; print('anthropic' in sys.modules or 'rich' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+
+def test_response_cache_dir_is_user_scoped(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert response_cache_dir() == tmp_path / "kevin" / "responses"
+    monkeypatch.delenv("XDG_CACHE_HOME")
+    assert response_cache_dir().is_relative_to(Path.home())
@@ -1,10 +1,21 @@
 """Tests for enhanced JSON validation and prompt shorteners."""
 
+from unittest.mock import patch
+
 import pytest
+from pydantic import ValidationError
 
 from kevin.models.claude import ClaudeClient
-from kevin.models.expansion import ExpansionProcessor
-from kevin.models.prompts import FilePreviewManager
+from kevin.models.expansion import ExpansionProcessor, SmartTruncation, _smart_truncate
+from kevin.models.prompts import (
+    PLAN_PROMPT,
+    REFLECT_PATCH_FAILURE_PROMPT,
+    FilePreviewManager,
+    PromptTemplate,
+    format_command_results,
+    format_file_contents_with_expansion,
+    iter_file_contents,
+)
 from kevin.models.types import ModelContext, Plan, Reflection
 from kevin.models.validation import DiffValidator, JSONValidator
 
@@ -23,6 +34,20 @@ class TestJSONValidation:
         assert plan.commands_to_run == ["ls"]
         assert plan.rationale == "test"
 
+    def test_nested_json_object_parsed_whole(self):
+        """A well-formed response is parsed as a whole, including nested objects."""
+        validator = JSONValidator()
+
+        text = '  {"outer": {"inner": {"value": 1}}, "flag": true}\n'
+        assert validator._extract_json(text) == {"outer": {"inner": {"value": 1}}, "flag": True}
+
+    def test_json_found_inside_prose(self):
+        """The first balanced object is extracted whole, however deeply it nests."""
+        validator = JSONValidator()
+
+        text = 'Plan below {"a": {"b": {"c": "}{ \\" }"}}, "d": 1} and {"e": 2} trailing'
+        assert validator._extract_json(text) == {"a": {"b": {"c": '}{ " }'}}, "d": 1}
+
     def test_malformed_json_repair(self):
         """Test auto-repair of malformed JSON."""
         validator = JSONValidator()
@@ -34,6 +59,46 @@ class TestJSONValidation:
         assert plan.files_to_read == ["main.py"]
         assert plan.commands_to_run == ["ls"]
 
+    def test_repair_leaves_double_quoted_strings_alone(self):
+        """Quotes, colons and literals inside existing strings survive the JSON fixer."""
+        validator = JSONValidator()
+
+        malformed = (
+            '{"rationale": "don\'t break http://x.y or True", '
+            "files_to_read: ['a.py'], should_retry: True, commands_to_run: [\"ls\",], }"
+        )
+        assert validator._extract_json(malformed) == {
+            "rationale": "don't break http://x.y or True",
+            "files_to_read": ["a.py"],
+            "should_retry": True,
+            "commands_to_run": ["ls"],
+        }
+
+    def test_key_value_fallback(self):
+        """Unparseable responses still yield the keys they mention, in one scan."""
+        validator = JSONValidator()
+
+        text = (
+            'My plan: {"files_to_read": ["a.py", \'b.py\'], "rationale": "step: read",\n'
+            "should_retry: yes, should_retry: no, \"next_action\": TRUE"
+        )
+        assert validator._extract_key_value_pairs(text) == {
+            "files_to_read": ["a.py", "b.py"],
+            "rationale": "step: read",
+            "should_retry": "yes",
+            "next_action": True,
+        }
+
+    def test_key_value_fallback_bare_values(self):
+        """Bare values end before the next key and keep any braces they contain."""
+        validator = JSONValidator()
+
+        text = "The plan: read files. files_to_read: [a.py] commands_to_run: [ls]"
+        assert validator._extract_key_value_pairs(text)["files_to_read"] == ["a.py"]
+        assert validator._extract_key_value_pairs("rationale: a {b} c") == {
+            "rationale": "a {b} c"
+        }
+
     def test_missing_fields_repair(self):
         """Test auto-repair when required fields are missing."""
         validator = JSONValidator()
@@ -57,6 +122,20 @@ class TestJSONValidation:
         assert isinstance(plan.files_to_read, list)
         assert isinstance(plan.commands_to_run, list)
 
+    def test_model_error_repair(self):
+        """Missing and mistyped fields reported by pydantic are filled in or coerced."""
+        validator = JSONValidator()
+        data = {"next_action": 1, "should_retry": "maybe"}
+        with pytest.raises(ValidationError) as excinfo:
+            Reflection(**data)
+
+        repaired = validator._repair_model_data(data, Reflection, excinfo.value)
+        assert repaired == {
+            "next_action": "1",
+            "lessons_learned": "Auto-generated lessons_learned",
+            "should_retry": False,
+        }
+
     def test_reflection_validation(self):
         """Test reflection response validation."""
         validator = JSONValidator()
@@ -117,6 +196,17 @@ class TestDiffValidation:
         assert "---" in result
         assert "+++" in result
 
+    def test_file_path_extraction(self):
+        """Paths keep their directories; version numbers aren't mistaken for files."""
+        validator = DiffValidator()
+
+        text = "edit src/kevin/repo.py and main.py, bump 1.1 to 2.0 in web/app-x.ts and main.py."
+        assert validator._extract_file_paths(text) == [
+            "src/kevin/repo.py",
+            "main.py",
+            "web/app-x.ts",
+        ]
+
 
 class TestFilePreviewManager:
     """Test file preview management functionality."""
@@ -162,6 +252,19 @@ class TestFilePreviewManager:
         assert expanded == content
         assert "[SHOW_MORE:" not in expanded
 
+    def test_truncation_cache_invalidated_by_expansion(self):
+        """Repeated truncation is served from cache until the file's preview is expanded."""
+        manager = FilePreviewManager()
+        content = "\n".join(f"line {i}" for i in range(1, 21))
+
+        first = manager.truncate_file_content(content, "test.py", 10)
+        with patch.object(FilePreviewManager, "_truncate_uncached") as uncached:
+            assert manager.truncate_file_content(content, "test.py", 10) == first
+            uncached.assert_not_called()
+
+        manager.expand_file_preview("test.py", 20)
+        assert manager.truncate_file_content(content, "test.py", 10) == content
+
     def test_expansion_hints(self):
         """Test extraction of expansion hints."""
         manager = FilePreviewManager()
@@ -171,6 +274,83 @@ class TestFilePreviewManager:
         
         assert "test.py:100" in hints
 
+    def test_formatted_contents_list_hints_for_truncated_files(self):
+        """Only files that were actually truncated are listed under expansion hints."""
+        manager = FilePreviewManager()
+        long_content = "\n".join(f"line {i}" for i in range(1, 21))
+        literal_marker = "docs mention [SHOW_MORE:other.py:5] verbatim"
+
+        formatted = format_file_contents_with_expansion(
+            {"long.py": long_content, "notes.md": literal_marker}, manager, 10
+        )
+
+        hints = formatted.split("[EXPANSION_HINTS]\n", 1)[1]
+        assert "- long.py:20\n" in hints
+        assert "other.py" not in hints
+
+    def test_iter_file_contents_is_lazy(self):
+        """Stopping after the first block leaves later files untouched."""
+        manager = FilePreviewManager()
+        blocks = iter_file_contents({"a.py": "a = 1", "b.py": "b = 2"}, 10, manager)
+
+        assert next(blocks) == "=== a.py ===\na = 1\n"
+        with patch.object(FilePreviewManager, "truncate_file_content") as truncate:
+            blocks.close()
+            truncate.assert_not_called()
+
+    def test_identical_files_formatted_once(self):
+        """Repeated content is referenced back to the first file instead of re-emitted."""
+        content = "\n".join(f"line {i}" for i in range(1, 21))
+        files = {"a.py": content, "copy/a.py": content, "empty.py": "", "also_empty.py": ""}
+
+        formatted = format_file_contents_with_expansion(files, FilePreviewManager(), 10)
+        assert "=== copy/a.py ===\n[duplicate of a.py]\n" in formatted
+        assert "=== also_empty.py ===\n\n" in formatted
+        assert "- copy/a.py:20" not in formatted
+        assert "".join(iter_file_contents(files, 10)).count("[duplicate of a.py]") == 1
+
+    def test_command_output_is_truncated(self):
+        """Long command output keeps only its head and tail."""
+        stdout = "\n".join(f"out {i}" for i in range(1, 301))
+        formatted = format_command_results(
+            [{"command": "pytest", "returncode": 1, "stdout": stdout, "stderr": "boom"}],
+            max_lines=10,
+        )
+
+        assert "Output: out 1\n" in formatted
+        assert "out 300\n" in formatted
+        assert "out 150" not in formatted
+        assert "(290 lines omitted)" in formatted
+        assert formatted.endswith("Error: boom\n")
+
+
+class TestPromptTemplate:
+    """Test pre-parsed prompt templates."""
+
+    def test_render_matches_str_format(self):
+        """Test that rendering is equivalent to str.format, including escaped braces."""
+        values = {
+            "task": "fix {it}",
+            "repo_path": "/repo",
+            "test_command": "pytest",
+            "has_src_layout": True,
+            "has_tests_dir": False,
+            "has_pyproject": True,
+            "has_setup_py": False,
+            "package_dirs": "src/pkg",
+            "test_files": "none found",
+        }
+        assert PromptTemplate(PLAN_PROMPT).render(**values) == PLAN_PROMPT.format(**values)
+
+        values = {"task": "t", "error_details": "e", "context": "c"}
+        rendered = PromptTemplate(REFLECT_PATCH_FAILURE_PROMPT).render(**values)
+        assert rendered == REFLECT_PATCH_FAILURE_PROMPT.format(**values)
+
+    def test_missing_field_raises(self):
+        """Test that a missing placeholder value fails loudly like str.format."""
+        with pytest.raises(KeyError):
+            PromptTemplate("Task: {task}").render()
+
 
 class TestExpansionProcessor:
     """Test expansion request processing."""
@@ -188,6 +368,7 @@ class TestExpansionProcessor:
             ("expand utils.py", True, "utils.py"),
             ("show more config.py", True, "config.py"),
             ("full content of main.py", True, "main.py"),
+            ("Please EXPAND Utils.py", True, "utils.py"),
             ("just a regular request", False, None),
         ]
         
@@ -218,6 +399,11 @@ class TestExpansionProcessor:
         # Test extension match
         assert processor._find_matching_file("config", available_files) == "config.json"
 
+        # A path with the same basename wins over one that merely ends with it
+        assert processor._find_matching_file("main.py", ["src/domain.py", "lib/main.py"]) == (
+            "lib/main.py"
+        )
+
     def test_nonexistent_file(self):
         """Test handling of nonexistent file requests."""
         manager = FilePreviewManager()
@@ -233,6 +419,67 @@ class TestExpansionProcessor:
         assert expanded_file is None
         assert "not found" in response
 
+    def test_expansion_summary(self):
+        """Test that only files longer than the preview limit are listed."""
+        processor = ExpansionProcessor(FilePreviewManager(default_max_lines=3))
+
+        summary = processor.get_expansion_summary(
+            {
+                "long.py": "a\nb\nc\nd",
+                "short.py": "a\nb",
+            }
+        )
+        assert summary == "Files with truncated content:\n- long.py: 4 lines (showing 3)"
+        summary = processor.get_expansion_summary({"short.py": "a"})
+        assert summary == "All files are fully displayed."
+
+
+class TestSmartTruncation:
+    """Test structure-preserving truncation."""
+
+    def test_preserves_definitions(self):
+        """Imports, functions and classes survive truncation; flags turn them off."""
+        body = [f"    x{i} = {i}" for i in range(40)]
+        content = "\n".join(
+            [
+                "import os",
+                "from sys import path",
+                *body,
+                "def helper():",
+                *body,
+                "class Thing:",
+                *body,
+            ]
+        )
+        truncation = SmartTruncation(FilePreviewManager())
+
+        result = truncation.truncate_with_context(content, "big.py", max_lines=20)
+        assert "import os" in result
+        assert "def helper():" in result
+        assert "class Thing:" in result
+        assert "[SHOW_MORE:big.py:" in result
+
+        result = truncation.truncate_with_context(
+            content, "big.py", max_lines=20, preserve_functions=False
+        )
+        assert "def helper():" not in result
+        assert "class Thing:" in result
+
+    def test_repeat_truncation_is_cached(self):
+        """Truncating unchanged content again reuses the cached result."""
+        content = "\n".join(f"line {i}" for i in range(100))
+        truncation = SmartTruncation(FilePreviewManager())
+
+        first = truncation.truncate_with_context(content, "cached.py", max_lines=10)
+        hits = _smart_truncate.cache_info().hits
+        assert truncation.truncate_with_context(content, "cached.py", max_lines=10) == first
+        assert _smart_truncate.cache_info().hits == hits + 1
+
+    def test_short_content_unchanged(self):
+        """Content within the limit is returned as-is."""
+        truncation = SmartTruncation(FilePreviewManager())
+        assert truncation.truncate_with_context("a\nb", "x.py", max_lines=5) == "a\nb"
+
 
 class TestIntegration:
     """Test integration of all components."""
@@ -265,6 +512,27 @@ class TestIntegration:
         assert context.preview_max_lines == 30
         assert context.enable_smart_truncation is True
 
+    def test_patch_prompt_reuses_file_formatting(self):
+        """Formatted file previews are rebuilt only when files or expansions change."""
+        client = ClaudeClient()
+        context = ModelContext(task="t", repo_path="/r", file_contents={"a.py": "x = 1"})
+
+        with patch(
+            "kevin.models.claude.format_file_contents_with_expansion", return_value="FILES"
+        ) as fmt:
+            client._build_patch_prompt(context)
+            client._build_patch_prompt(context)
+            assert fmt.call_count == 1
+
+            context.file_contents["b.py"] = "y = 2"
+            context.mark_file_contents_changed()
+            client._build_patch_prompt(context)
+            assert fmt.call_count == 2
+
+            client.expand_file_preview("a.py", 100)
+            client._build_patch_prompt(context)
+            assert fmt.call_count == 3
+
 
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import subprocess
 import tempfile
 from pathlib import Path
 from unittest.mock import Mock, patch
 
-from kevin.models import ClaudeClient, ModelContext
-from kevin.sandbox.local import LocalSandbox
+import pytest
+
+from kevin.loop_executor import LoopExecutor
+from kevin.models import ClaudeClient, ModelContext, Plan
+from kevin.models import claude as claude_module
+from kevin.models.loop_state import LoopState, StepStatus
+from kevin.sandbox.local import LocalSandbox, _parse_whole_file_hunks, _prepare_diff
 
 
 def create_toy_repo() -> Path:
@@ -85,7 +91,7 @@ uv run pytest test_main.py -v
     return temp_dir
 
 
-@patch("kevin.models.claude.Anthropic")
+@patch.object(claude_module, "Anthropic")
 def test_toy_repo_integration(mock_anthropic):
     """Test the full integration with a toy repository."""
     # Create toy repo
@@ -176,6 +182,32 @@ def test_toy_repo_integration(mock_anthropic):
     shutil.rmtree(toy_repo)
 
 
+def test_fetch_step_runs_plan_commands_in_order():
+    """Plan commands run one after another, even when an earlier one is slow."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sandbox = LocalSandbox(workdir=temp_dir)
+        sandbox.write_file("main.py", "print('hi')\n")
+        plan = Plan(
+            files_to_read=["main.py"],
+            commands_to_run=["sleep 0.2; echo install >> log", "echo build >> log", "cat log"],
+            rationale="order matters",
+        )
+        context = ModelContext(task="t", repo_path=temp_dir)
+        executor = LoopExecutor(
+            client=Mock(),
+            sandbox=sandbox,
+            context=context,
+            loop_state=LoopState(current_plan=plan),
+            console=Mock(),
+        )
+
+        result = executor._execute_fetch_files_step()
+
+        assert result.status == StepStatus.COMPLETED
+        assert [r["command"] for r in context.command_results] == plan.commands_to_run
+        assert context.command_results[-1]["stdout"] == "install\nbuild\n"
+
+
 def test_sandbox_file_operations():
     """Test sandbox file read/write operations."""
     with tempfile.TemporaryDirectory() as temp_dir:
@@ -192,3 +224,217 @@ def test_sandbox_file_operations():
         result = sandbox.exec("uv run python test.py", timeout=30)
         assert result.returncode == 0
         assert "hello world" in result.stdout
+
+
+def test_prepare_diff_strips_prose_and_normalizes_paths():
+    """Raw model output is cleaned into an a/ b/ prefixed diff, or rejected."""
+    raw = "Here is the fix:\n--- main.py\n+++ main.py\n@@ -1 +1 @@\n-old\n+new\n"
+    assert _prepare_diff(raw) == "--- a/main.py\n+++ b/main.py\n@@ -1 +1 @@\n-old\n+new"
+    assert _prepare_diff(raw) is _prepare_diff(raw)
+    assert _prepare_diff("I could not produce a patch.") is None
+
+
+def test_sandbox_apply_file_edits():
+    """File edits create, replace and delete files and report missing targets."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sandbox = LocalSandbox(workdir=temp_dir)
+        sandbox.write_file("old.py", "x = 1\n")
+
+        result = sandbox.apply_file_edits(
+            [
+                {"path": "pkg/a.py", "mode": "create", "content": "a = 1\n"},
+                {"path": "pkg/b.py", "mode": "create", "content": "b = 'é'\n"},
+                {"path": "old.py", "mode": "replace", "content": "x = 2\n"},
+                {"path": "old.py", "mode": "delete"},
+                {"path": "missing.py", "mode": "delete"},
+            ]
+        )
+
+        assert result.returncode == 1
+        assert "does not exist for deletion" in result.stderr
+        assert sandbox.read_file("pkg/b.py") == "b = 'é'\n"
+        assert not (Path(temp_dir) / "old.py").exists()
+        assert result.stdout.splitlines() == [
+            "created pkg/a.py",
+            "created pkg/b.py",
+            "replaced old.py",
+            "deleted old.py",
+        ]
+
+
+def test_sandbox_apply_file_edits_concurrently_keeps_order():
+    """Edits to distinct paths may run in parallel but are reported in input order."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sandbox = LocalSandbox(workdir=temp_dir)
+        edits = [
+            {"path": f"pkg/mod_{i}.py", "mode": "create", "content": f"n = {i}\n"}
+            for i in range(20)
+        ]
+
+        result = sandbox.apply_file_edits(edits)
+
+        assert result.returncode == 0
+        assert result.stdout.endswith(", ".join(f"created pkg/mod_{i}.py" for i in range(20)))
+        assert sandbox.read_file("pkg/mod_7.py") == "n = 7\n"
+
+
+def test_sandbox_exec_with_and_without_shell():
+    """Simple commands run directly; shell syntax and unknown programs still go through sh."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sandbox = LocalSandbox(workdir=temp_dir)
+
+        assert sandbox.exec("echo 'two words'").stdout == "two words\n"
+        assert sandbox.exec("echo a | tr a b").stdout == "b\n"
+        assert sandbox.exec("GREETING=hi sh -c 'echo $GREETING'").stdout == "hi\n"
+        assert sandbox.exec("definitely-not-a-command-xyz").returncode == 127
+
+
+def test_sandbox_exec_tolerates_invalid_utf8():
+    """Undecodable output bytes are replaced instead of raising."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sandbox = LocalSandbox(workdir=temp_dir)
+
+        result = sandbox.exec("printf 'ok\\377\\r\\n'")
+        assert result.returncode == 0
+        assert result.stdout == "ok�\n"
+
+
+def test_sandbox_apply_patch_writes_whole_file_hunks_directly():
+    """New files and whole-file rewrites are applied without running git."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sandbox = LocalSandbox(workdir=temp_dir)
+        sandbox.write_file("greet.py", "def greet():\n    return 'hi'\n")
+
+        diff = """--- /dev/null
++++ b/pkg/new.py
+@@ -0,0 +1,2 @@
++def new():
++    return 1
+--- a/greet.py
++++ b/greet.py
+@@ -1,2 +1,2 @@
+ def greet():
+-    return 'hi'
++    return 'hello'
+"""
+        with patch("kevin.sandbox.local.subprocess.run") as mock_run:
+            result = sandbox.apply_patch(diff)
+
+        mock_run.assert_not_called()
+        assert result.returncode == 0
+        assert sandbox.read_file("pkg/new.py") == "def new():\n    return 1\n"
+        assert sandbox.read_file("greet.py") == "def greet():\n    return 'hello'\n"
+
+
+def test_sandbox_apply_patch_direct_path_requires_matching_file():
+    """A whole-file hunk whose old side doesn't match the file is left to git."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sandbox = LocalSandbox(workdir=temp_dir)
+        sandbox.write_file("greet.py", "def greet():\n    return 'hey'\n")
+
+        diff = (
+            "--- a/greet.py\n+++ b/greet.py\n@@ -1,2 +1,2 @@\n"
+            " def greet():\n-    return 'hi'\n+    return 'hello'\n"
+        )
+        assert sandbox._try_direct_apply(diff) is None
+        assert sandbox.apply_patch(diff).returncode != 0
+        assert sandbox.read_file("greet.py") == "def greet():\n    return 'hey'\n"
+
+
+@pytest.mark.parametrize(
+    "headers",
+    [
+        "new file mode 120000",
+        "old mode 100644\nnew mode 100755",
+        "deleted file mode 100644",
+        "similarity index 90%\nrename from old.py\nrename to greet.py",
+    ],
+    ids=["symlink", "mode-change", "delete", "rename"],
+)
+def test_parse_whole_file_hunks_leaves_git_headers_to_git(headers):
+    """Mode, delete and rename headers leave the diff to git instead of being skipped."""
+    diff = (
+        f"diff --git a/greet.py b/greet.py\n{headers}\n"
+        "--- a/greet.py\n+++ b/greet.py\n@@ -1 +1 @@\n-a\n+b\n"
+    )
+    assert _parse_whole_file_hunks(diff) is None
+
+
+def test_sandbox_apply_patch_keeps_new_file_mode():
+    """A new file created with mode 100755 is written executable."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sandbox = LocalSandbox(workdir=temp_dir)
+        diff = (
+            "diff --git a/run.sh b/run.sh\nnew file mode 100755\n"
+            "--- /dev/null\n+++ b/run.sh\n@@ -0,0 +1 @@\n+echo hi\n"
+            "diff --git a/lib.sh b/lib.sh\nnew file mode 100644\n"
+            "--- /dev/null\n+++ b/lib.sh\n@@ -0,0 +1 @@\n+true\n"
+        )
+        assert sandbox.apply_patch(diff).returncode == 0
+        assert (Path(temp_dir) / "run.sh").stat().st_mode & 0o111
+        assert not (Path(temp_dir) / "lib.sh").stat().st_mode & 0o111
+
+
+def test_sandbox_apply_patch_direct_path_refuses_symlinks():
+    """Whole-file hunks never write through a symlink that leaves the workspace."""
+    with tempfile.TemporaryDirectory() as outside, tempfile.TemporaryDirectory() as temp_dir:
+        target = Path(outside) / "secret.txt"
+        target.write_text("old\n")
+        (Path(temp_dir) / "file.txt").symlink_to(target)
+        (Path(temp_dir) / "out").symlink_to(outside)
+        sandbox = LocalSandbox(workdir=temp_dir)
+
+        replace = "--- a/file.txt\n+++ b/file.txt\n@@ -1 +1 @@\n-old\n+new\n"
+        create = "--- /dev/null\n+++ b/out/new.txt\n@@ -0,0 +1 @@\n+new\n"
+        assert sandbox._try_direct_apply(replace) is None
+        assert sandbox._try_direct_apply(create) is None
+        sandbox.apply_patch(replace)
+        sandbox.apply_patch(create)
+
+        assert target.read_text() == "old\n"
+        assert not (Path(outside) / "new.txt").exists()
+
+
+def test_sandbox_write_file_is_atomic_and_keeps_metadata():
+    """Rewrites go through a renamed temp file but keep modes and symlinks intact."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sandbox = LocalSandbox(workdir=temp_dir)
+        script = Path(temp_dir) / "run.sh"
+        script.write_text("echo old\n")
+        script.chmod(0o755)
+        (Path(temp_dir) / "link.sh").symlink_to("run.sh")
+
+        sandbox.write_file("link.sh", "echo new\n")
+
+        assert (Path(temp_dir) / "link.sh").is_symlink()
+        assert script.read_text() == "echo new\n"
+        assert script.stat().st_mode & 0o777 == 0o755
+        assert sorted(p.name for p in Path(temp_dir).iterdir()) == ["link.sh", "run.sh"]
+
+
+def test_sandbox_timing_can_be_disabled():
+    """collect_timing=False reports zero durations."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        assert LocalSandbox(workdir=temp_dir, collect_timing=False).exec("true").duration_s == 0.0
+        assert LocalSandbox(workdir=temp_dir).exec("sleep 0.01").duration_s > 0.0
+
+
+def test_sandbox_persistent_shell():
+    """A reused shell keeps streams and exit codes separate and commands isolated."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        sandbox = LocalSandbox(workdir=temp_dir, persistent_shell=True)
+        try:
+            result = sandbox.exec("echo out; echo err >&2; exit 3")
+            assert (result.returncode, result.stdout, result.stderr) == (3, "out\n", "err\n")
+
+            assert sandbox.exec("printf 'no newline'").stdout == "no newline"
+            sandbox.exec("cd /; export LEAK=1")
+            assert sandbox.exec("pwd; echo ${LEAK:-unset}").stdout == f"{sandbox.workdir}\nunset\n"
+            assert sandbox.exec("echo 'unclosed").returncode != 0
+            assert sandbox.exec(["echo", "argv"]).stdout == "argv\n"
+
+            with pytest.raises(subprocess.TimeoutExpired):
+                sandbox.exec("sleep 5", timeout=1)
+            assert sandbox.exec("echo recovered").stdout == "recovered\n"
+        finally:
+            sandbox.close()
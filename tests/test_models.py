@@ -1,13 +1,79 @@
 from __future__ import annotations
 
-import json
-from unittest.mock import Mock, patch
+import asyncio
+import functools
+import importlib.util
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
 import pytest
+from anthropic import APIConnectionError
 
-from kevin.models.claude import ClaudeClient
+from kevin.models import claude as claude_module
+from kevin.models.cache import ResponseCache
+from kevin.models.claude import AsyncClaudeClient, ClaudeClient
+from kevin.models.loop_state import LoopState, StepResult, StepStatus, StepType
 from kevin.models.types import ModelContext, Patch, Plan, Reflection
 
+# Canned model replies and the fields the client should parse out of them
+_PLAN_FIELDS = {
+    "files_to_read": ["main.py"],
+    "commands_to_run": ["python main.py"],
+    "rationale": "Test the main file",
+}
+_REFLECTION_FIELDS = {
+    "next_action": "Try a different approach",
+    "lessons_learned": "The API was wrong",
+    "should_retry": True,
+}
+_PLAN_TEXT = (
+    '{"files_to_read": ["main.py"], "commands_to_run": ["python main.py"], '
+    '"rationale": "Test the main file"}'
+)
+_REFLECTION_TEXT = (
+    '{"next_action": "Try a different approach", "lessons_learned": "The API was wrong", '
+    '"should_retry": true}'
+)
+
+
+def _response(text: str) -> SimpleNamespace:
+    """A stand-in for an API message: only `.content[0].text` is ever read."""
+    return SimpleNamespace(content=[SimpleNamespace(text=text)])
+
+
+@pytest.fixture(scope="module")
+def claude_client():
+    """One client built against the session-wide Anthropic patch."""
+    return ClaudeClient()
+
+
+@pytest.fixture(scope="module")
+def ctx():
+    """A minimal context the client tests only read; built once without re-validating."""
+    return ModelContext.model_construct(task="test", repo_path="/tmp")
+
+
+@functools.cache
+def _valid_diff() -> str:
+    """A small well-formed unified diff, assembled on first use."""
+    return "\n".join(
+        (
+            "--- a/main.py",
+            "+++ b/main.py",
+            "@@ -1,3 +1,3 @@",
+            " def hello():",
+            '-    print("hello")',
+            '+    print("Hello, World!")',
+            "",
+        )
+    )
+
+
+@functools.cache
+def _valid_patch() -> Patch:
+    """One validated Patch for tests that only read its fields."""
+    return Patch(unified_diff=_valid_diff())
+
 
 def test_plan_validation():
     """Test Plan model validation."""
@@ -21,35 +87,55 @@ def test_plan_validation():
     assert plan.commands_to_run == ["uv run python main.py", "uv run pytest"]
 
     # Invalid plan - empty files
-    with pytest.raises(ValueError, match="Must specify at least one file"):
+    with pytest.raises(ValueError) as excinfo:
         Plan(files_to_read=[], commands_to_run=["ls"], rationale="test")
+    assert "Must specify at least one file" in str(excinfo.value)
 
     # Invalid plan - empty commands
-    with pytest.raises(ValueError, match="Must specify at least one command"):
+    with pytest.raises(ValueError) as excinfo:
         Plan(files_to_read=["main.py"], commands_to_run=[], rationale="test")
+    assert "Must specify at least one command" in str(excinfo.value)
+
+
+# Empty, single, multiple, blank and non-ASCII entries
+_SAMPLE_LISTS = ([], ["main.py"], ["a.py", "pkg/b.py"], [""], ["  "], ["ünïcode.py"])
+
+
+@pytest.mark.parametrize("files", _SAMPLE_LISTS)
+@pytest.mark.parametrize("commands", _SAMPLE_LISTS)
+def test_plan_requires_non_empty_lists(files, commands):
+    """Any non-empty file and command lists validate; an empty one is rejected."""
+    if files and commands:
+        plan = Plan(files_to_read=files, commands_to_run=commands, rationale="x")
+        assert (plan.files_to_read, plan.commands_to_run) == (files, commands)
+    else:
+        with pytest.raises(ValueError):
+            Plan(files_to_read=files, commands_to_run=commands, rationale="x")
 
 
 def test_patch_validation():
     """Test Patch model validation."""
     # Valid patch
-    valid_diff = """--- a/main.py
-+++ b/main.py
-@@ -1,3 +1,3 @@
- def hello():
--    print("hello")
-+    print("Hello, World!")
-"""
-    patch = Patch(unified_diff=valid_diff)
-    assert "--- a/main.py" in patch.unified_diff
-    assert "+++ b/main.py" in patch.unified_diff
+    diff = _valid_patch().unified_diff
+    assert all(marker in diff for marker in ("--- a/main.py", "+++ b/main.py"))
 
     # Invalid patch - empty
-    with pytest.raises(ValueError, match="Patch cannot be empty"):
+    with pytest.raises(ValueError) as excinfo:
         Patch(unified_diff="")
+    assert "Patch cannot be empty" in str(excinfo.value)
 
     # Invalid patch - missing markers
-    with pytest.raises(ValueError, match="Patch must contain"):
+    with pytest.raises(ValueError) as excinfo:
         Patch(unified_diff="just some text")
+    assert "Patch must contain" in str(excinfo.value)
+
+    # A git-style header needs the '---' and '+++' file headers too
+    with pytest.raises(ValueError) as excinfo:
+        Patch(unified_diff="diff --git a/main.py b/main.py\n+++ b/main.py\n@@ -1 +1 @@\n")
+    assert "'---' markers" in str(excinfo.value)
+    with pytest.raises(ValueError) as excinfo:
+        Patch(unified_diff="diff --git a/main.py b/main.py\n--- a/main.py\n")
+    assert "'+++' markers" in str(excinfo.value)
 
 
 def test_reflection_validation():
@@ -76,99 +162,258 @@ def test_model_context():
     assert "main.py" in context.file_contents
 
 
-@patch("kevin.models.claude.Anthropic")
-def test_claude_client_plan(mock_anthropic):
-    """Test ClaudeClient plan generation."""
-    # Mock the API response
-    mock_response = Mock()
-    mock_response.content = [Mock()]
-    mock_response.content[0].text = json.dumps(
-        {
-            "files_to_read": ["main.py"],
-            "commands_to_run": ["python main.py"],
-            "rationale": "Test the main file",
-        }
-    )
+@pytest.mark.llm
+@pytest.mark.parametrize(
+    "method, args, response_text, expected",
+    [
+        pytest.param(
+            "plan",
+            (),
+            _PLAN_TEXT,
+            _PLAN_FIELDS,
+            id="plan",
+        ),
+        pytest.param(
+            "propose_patch",
+            (
+                Plan.model_construct(
+                    files_to_read=["main.py"], commands_to_run=["ls"], rationale="test"
+                ),
+            ),
+            _valid_diff(),
+            # The diff validator drops the trailing newline
+            {"unified_diff": _valid_diff().rstrip("\n")},
+            id="patch",
+        ),
+        pytest.param(
+            "reflect",
+            ("Failed to connect to API",),
+            _REFLECTION_TEXT,
+            _REFLECTION_FIELDS,
+            id="reflection",
+        ),
+    ],
+)
+def test_claude_client_methods(ctx, method, args, response_text, expected):
+    """Test ClaudeClient plan, patch and reflection calls parse the API response."""
+    response = _response(response_text)
+    client = ClaudeClient(transport=lambda **kwargs: response)
+
+    result = getattr(client, method)(ctx, *args)
+    assert {field: getattr(result, field) for field in expected} == expected
+
+
+@pytest.mark.llm
+@pytest.mark.parametrize(
+    "method, text, expected, generated_fields",
+    [
+        pytest.param(
+            "_parse_plan_response",
+            "This is not JSON at all",
+            {"files_to_read": ["README.md", "main.py"]},  # Auto-repair default
+            ("rationale",),
+            id="plan",
+        ),
+        pytest.param(
+            "_parse_reflection_response",
+            "Also not JSON",
+            {},
+            ("next_action", "lessons_learned"),
+            id="reflection",
+        ),
+    ],
+)
+def test_auto_repair_on_bad_json(claude_client, method, text, expected, generated_fields):
+    """Test that ClaudeClient auto-repairs bad JSON responses."""
+    result = getattr(claude_client, method)(text)
+    assert {field: getattr(result, field) for field in expected} == expected
+    for field in generated_fields:
+        assert "Auto-generated" in getattr(result, field)
+
+
+# Latency of the parse-failure/auto-repair path; run with `pytest --benchmark-only`
+@pytest.mark.benchmark
+@pytest.mark.skipif(
+    importlib.util.find_spec("pytest_benchmark") is None, reason="needs pytest-benchmark"
+)
+@pytest.mark.parametrize(
+    "method", ["_parse_plan_response", "_parse_reflection_response"], ids=["plan", "reflection"]
+)
+def test_auto_repair_bench(benchmark, claude_client, method):
+    """Benchmark auto-repair of a malformed model reply."""
+    benchmark(getattr(claude_client, method), "not json at all")
+
+
+@pytest.mark.llm
+@patch.object(claude_module, "AsyncAnthropic")
+def test_async_claude_client_plan(mock_anthropic, ctx):
+    """Test AsyncClaudeClient plan generation."""
+    mock_response = _response(_PLAN_TEXT)
 
     mock_client = Mock()
-    mock_client.messages.create.return_value = mock_response
+    mock_client.messages.create = AsyncMock(return_value=mock_response)
     mock_anthropic.return_value = mock_client
 
-    client = ClaudeClient()
-    context = ModelContext(task="test", repo_path="/tmp")
+    client = AsyncClaudeClient()
 
-    plan = client.plan(context)
+    plan = asyncio.run(client.plan(ctx))
     assert plan.files_to_read == ["main.py"]
-    assert plan.commands_to_run == ["python main.py"]
     assert plan.rationale == "Test the main file"
 
 
-@patch("kevin.models.claude.Anthropic")
-def test_claude_client_patch(mock_anthropic):
-    """Test ClaudeClient patch generation."""
-    # Mock the API response
-    mock_response = Mock()
-    mock_response.content = [Mock()]
-    mock_response.content[0].text = """--- a/main.py
-+++ b/main.py
-@@ -1,3 +1,3 @@
- def hello():
--    print("hello")
-+    print("Hello, World!")
-"""
+@pytest.mark.llm
+def test_claude_client_transport_is_non_streaming(ctx):
+    """The async client takes a transport too; neither client accepts one with stream=True."""
 
-    mock_client = Mock()
-    mock_client.messages.create.return_value = mock_response
-    mock_anthropic.return_value = mock_client
+    async def transport(**kwargs):
+        return _response(_PLAN_TEXT)
 
-    client = ClaudeClient()
-    context = ModelContext(task="test", repo_path="/tmp")
-    plan = Plan(files_to_read=["main.py"], commands_to_run=["ls"], rationale="test")
-
-    patch = client.propose_patch(context, plan)
-    assert "--- a/main.py" in patch.unified_diff
-    assert "+++ b/main.py" in patch.unified_diff
-
-
-@patch("kevin.models.claude.Anthropic")
-def test_claude_client_reflection(mock_anthropic):
-    """Test ClaudeClient reflection."""
-    # Mock the API response
-    mock_response = Mock()
-    mock_response.content = [Mock()]
-    mock_response.content[0].text = json.dumps(
-        {
-            "next_action": "Try a different approach",
-            "lessons_learned": "The API was wrong",
-            "should_retry": True,
-        }
-    )
+    plan = asyncio.run(AsyncClaudeClient(transport=transport).plan(ctx))
+    assert plan.files_to_read == ["main.py"]
+
+    for client_cls in (ClaudeClient, AsyncClaudeClient):
+        with pytest.raises(ValueError):
+            client_cls(stream=True, transport=transport)
+
+
+@pytest.mark.llm
+@patch.object(claude_module.time, "sleep")
+def test_claude_client_retries_transient_errors(mock_sleep):
+    """Test that transient API errors are retried with backoff."""
+    outcomes = [APIConnectionError(request=Mock()), _response("ok")]
+
+    def transport(**kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    client = ClaudeClient(transport=transport)
+    assert client._call_claude("prompt") == "ok"
+    assert outcomes == []
+    mock_sleep.assert_called_once_with(1.0)
+
+
+@pytest.mark.llm
+@patch.object(claude_module, "Anthropic")
+def test_claude_client_batch_call(mock_anthropic):
+    """Test that batch results are returned in prompt order."""
+
+    def entry(custom_id, text):
+        result = SimpleNamespace(type="succeeded", message=_response(text))
+        return SimpleNamespace(custom_id=custom_id, result=result)
 
     mock_client = Mock()
-    mock_client.messages.create.return_value = mock_response
+    batches = mock_client.messages.batches
+    batches.create.return_value = Mock(id="batch-1", processing_status="ended")
+    batches.results.return_value = [
+        entry("prompt-1", "second"),
+        entry("prompt-0", "first"),
+    ]
     mock_anthropic.return_value = mock_client
 
     client = ClaudeClient()
-    context = ModelContext(task="test", repo_path="/tmp")
+    assert client.batch_call(["a", "b"]) == ["first", "second"]
+    requests = batches.create.call_args.kwargs["requests"]
+    assert [r["custom_id"] for r in requests] == ["prompt-0", "prompt-1"]
+    mock_client.messages.create.assert_not_called()
 
-    reflection = client.reflect(context, "Failed to connect to API")
-    assert reflection.next_action == "Try a different approach"
-    assert reflection.lessons_learned == "The API was wrong"
-    assert reflection.should_retry is True
 
+@pytest.mark.llm
+@patch.object(claude_module.time, "sleep")
+@patch.object(claude_module, "Anthropic")
+def test_claude_client_batch_call_times_out(mock_anthropic, mock_sleep):
+    """Test that a batch still running at the deadline is cancelled and sent sequentially."""
+    mock_client = Mock()
+    batches = mock_client.messages.batches
+    batches.create.return_value = Mock(id="batch-1", processing_status="in_progress")
+    batches.retrieve.return_value = batches.create.return_value
+    mock_anthropic.return_value = mock_client
 
-def test_auto_repair_on_bad_json():
-    """Test that ClaudeClient auto-repairs bad JSON responses."""
-    client = ClaudeClient()
+    replies = iter(["first", "second"])
+    client = ClaudeClient(transport=lambda **kwargs: _response(next(replies)))
+    assert client.batch_call(["a", "b"], timeout_s=0.0) == ["first", "second"]
+    batches.cancel.assert_called_once_with("batch-1")
+    batches.results.assert_not_called()
+
+
+@pytest.mark.llm
+def test_claude_client_response_cache(tmp_path):
+    """Test that repeated prompts are served from the response cache."""
+    prompts = []
+
+    def transport(**kwargs):
+        prompts.append(kwargs["messages"][0]["content"])
+        return _response("cached answer")
+
+    client = ClaudeClient(cache=ResponseCache(tmp_path), transport=transport)
+    assert client._call_claude("same prompt") == "cached answer"
+    assert client._call_claude("same prompt") == "cached answer"
+    assert prompts == ["same prompt"]
+
+    # A fresh client sharing the cache directory hits the persisted entry
+    fresh = ClaudeClient(cache=ResponseCache(tmp_path), transport=transport)
+    assert fresh._call_claude("same prompt") == "cached answer"
+    assert prompts == ["same prompt"]
+    assert (client.cache.hits, fresh.cache.hits) == (1, 1)
+
+
+@pytest.mark.llm
+@patch.object(claude_module, "Anthropic")
+def test_claude_client_streaming(mock_anthropic):
+    """Test that streamed text deltas are joined into the full response."""
+    mock_client = MagicMock()
+    stream = mock_client.messages.stream.return_value.__enter__.return_value
+    stream.text_stream = iter(["--- a/main.py\n", "+++ b/main.py\n"])
+    mock_anthropic.return_value = mock_client
 
-    # Test bad plan JSON
-    bad_plan_response = "This is not JSON at all"
-    plan = client._parse_plan_response(bad_plan_response)
-    assert plan.files_to_read == ["README.md", "main.py"]  # Auto-repair default
-    assert "Auto-generated" in plan.rationale
-
-    # Test bad reflection JSON
-    bad_reflection_response = "Also not JSON"
-    reflection = client._parse_reflection_response(bad_reflection_response)
-    assert "Auto-generated" in reflection.next_action
-    assert "Auto-generated" in reflection.lessons_learned
+    client = ClaudeClient(stream=True)
+    assert client._call_claude("prompt") == "--- a/main.py\n+++ b/main.py\n"
+    mock_client.messages.create.assert_not_called()
+
+
+def test_loop_state_status_counts():
+    """Test that LoopState keeps per-status counts and the last apply failure."""
+    state = LoopState()
+    state.add_step_result(StepResult(step_type=StepType.PLAN, status=StepStatus.COMPLETED))
+    failed_apply = StepResult(step_type=StepType.APPLY, status=StepStatus.FAILED, error="boom")
+    state.add_step_result(failed_apply)
+    state.add_step_result(StepResult(step_type=StepType.RUN_TESTS, status=StepStatus.SKIPPED))
+
+    assert state.get_status_count(StepStatus.COMPLETED) == 1
+    assert state.get_status_count(StepStatus.FAILED) == 1
+    assert state.get_status_count(StepStatus.SKIPPED) == 1
+    assert state.get_status_count(StepStatus.PENDING) == 0
+    assert state.get_last_apply_failure() is failed_apply
+    assert state.get_last_failed_step() is failed_apply
+
+    state.mark_failed("stop")
+    assert state.get_last_failed_step().error == "stop"
+    assert state.get_last_apply_failure() is failed_apply
+
+
+def test_loop_state_indexes_prefilled_results():
+    """Test that counts and last failures are rebuilt from results given up front."""
+    failed_apply = StepResult(step_type=StepType.APPLY, status=StepStatus.FAILED, error="boom")
+    results = [StepResult(step_type=StepType.PLAN, status=StepStatus.COMPLETED), failed_apply]
+
+    for state in (
+        LoopState(step_results=results),
+        LoopState.model_validate_json(LoopState(step_results=results).model_dump_json()),
+    ):
+        assert state.get_status_count(StepStatus.COMPLETED) == 1
+        assert state.get_status_count(StepStatus.FAILED) == 1
+        assert state.get_last_apply_failure() == failed_apply
+        assert state.get_last_failed_step() == failed_apply
+    assert "status_counts" not in state.model_dump()
+
+
+def test_loop_state_test_output_tail():
+    """Test that the test output tail keeps exactly the last N lines."""
+    state = LoopState()
+    assert state.get_test_output_tail(3) == ""
+
+    state.test_output = "one\ntwo\nthree\nfour\n"
+    assert state.get_test_output_tail(2) == "four\n"
+    assert state.get_test_output_tail(3) == "three\nfour\n"
+    assert state.get_test_output_tail(10) == state.test_output
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from kevin.repo import _file_contains, detect_project_info, detect_test_command, prepare_repo
+
+
+def make_project(root: Path) -> Path:
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "src" / "pkg" / "__init__.py").write_text("")
+    (root / "tests").mkdir()
+    (root / "tests" / "test_pkg.py").write_text("def test_ok():\n    pass\n")
+    (root / "pyproject.toml").write_text("[project]\nname = 'pkg'\n")
+    return root
+
+
+def test_detect_project_info(tmp_path: Path) -> None:
+    info = detect_project_info(make_project(tmp_path))
+    assert info["has_src_layout"] is True
+    assert info["has_tests_dir"] is True
+    assert info["has_pyproject"] is True
+    assert info["has_setup_py"] is False
+    assert info["package_dirs"] == ["src/pkg"]
+    assert info["test_files"] == ["tests/test_pkg.py"]
+
+
+def test_detect_project_info_cache_is_isolated(tmp_path: Path) -> None:
+    repo = make_project(tmp_path)
+    detect_project_info(repo)["package_dirs"].append("mutated")
+    assert detect_project_info(repo)["package_dirs"] == ["src/pkg"]
+
+
+def test_detection_refreshes_when_workspace_changes(tmp_path: Path) -> None:
+    assert detect_test_command(tmp_path) is None
+    assert detect_project_info(tmp_path)["has_setup_py"] is False
+
+    (tmp_path / "pytest.ini").write_text("[pytest]\n")
+    (tmp_path / "setup.py").write_text("")
+
+    assert detect_test_command(tmp_path) == "uv run pytest -q"
+    assert detect_project_info(tmp_path)["has_setup_py"] is True
+
+
+def test_pyproject_pytest_config_detected(tmp_path: Path) -> None:
+    (tmp_path / "pyproject.toml").write_text("[tool.pytest.ini_options]\n")
+    assert detect_test_command(tmp_path) == "uv run pytest -q"
+
+
+def test_file_contains_spans_chunk_boundaries(tmp_path: Path) -> None:
+    path = tmp_path / "big.toml"
+    path.write_bytes(b"x" * 7 + b"pytest" + b"y" * 20)
+    assert _file_contains(path, b"pytest", chunk_size=10)
+    assert not _file_contains(path, b"nox", chunk_size=10)
+
+
+def test_package_json_test_script(tmp_path: Path) -> None:
+    (tmp_path / "package.json").write_text('{"scripts": {"build": "tsc", "test-e2e": "x"}}')
+    assert detect_test_command(tmp_path) is None
+
+    (tmp_path / "package.json").write_text('{"scripts": {"test": "jest"}}')
+    (tmp_path / "stamp").write_text("")  # touch the directory so detection re-runs
+    assert detect_test_command(tmp_path) == "npm test --silent"
+
+
+def test_prepare_repo_rechecks_removed_paths(tmp_path: Path) -> None:
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    assert prepare_repo(str(repo)) == repo.resolve()
+    assert prepare_repo(str(repo)) == repo.resolve()
+
+    shutil.rmtree(repo)
+    with pytest.raises(ValueError, match="Not a path or git URL"):
+        prepare_repo(str(repo))